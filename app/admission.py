@@ -0,0 +1,167 @@
+import asyncio
+import json
+import math
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from .config import Settings
+
+ROUTE_CLASSES = ('reads', 'writes', 'analytics', 'exports')
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Monitoring, long-lived streams, and job routes that are bounded by the job pool
+EXEMPT_PREFIXES = ('/internal/', '/changes/stream', '/jobs/')
+ANALYTICS_PREFIXES = ('/analytics/', '/matching/')
+EXPORT_PREFIXES = ('/directory/emails', '/changes')
+# A batch only carries GETs, so it counts as one read; sub-requests of other
+# classes take their own slots (batch.BatchDispatcher)
+BATCH_PATH = '/batch'
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    if path.startswith(EXEMPT_PREFIXES):
+        return None
+    if path.startswith(ANALYTICS_PREFIXES):
+        return 'analytics'
+    if path.startswith(EXPORT_PREFIXES):
+        return 'exports'
+    if path == BATCH_PATH:
+        return 'reads'
+    if method not in SAFE_METHODS:
+        return 'writes'
+    return 'reads'
+
+
+class RouteLimiter:
+    """Concurrency limit with a bounded FIFO wait queue.
+
+    Used from the event loop only, so the counters need no lock. A released
+    slot is handed straight to the oldest waiter.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> bool:
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self.timed_out += 1
+            return False
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.admitted += 1
+        return True
+
+    def _abandon(self, waiter: asyncio.Future):
+        if waiter.done() and not waiter.cancelled():
+            # The slot was handed over just as the wait ended; pass it on
+            self.release()
+        else:
+            waiter.cancel()
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            'max_concurrent': self.max_concurrent,
+            'max_queue': self.max_queue,
+            'active': self.active,
+            'waiting': len(self._waiters),
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+        }
+
+
+class AdmissionController:
+    def __init__(self, limiters: Dict[str, RouteLimiter], retry_after: int):
+        self.limiters = limiters
+        self.retry_after = retry_after
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> 'AdmissionController':
+        limiters = {
+            name: RouteLimiter(
+                name,
+                getattr(settings, f'admission_{name}_concurrency'),
+                getattr(settings, f'admission_{name}_queue'),
+                settings.admission_queue_timeout
+            )
+            for name in ROUTE_CLASSES
+        }
+        return cls(limiters, max(1, math.ceil(settings.admission_queue_timeout)))
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
+
+
+class AdmissionMiddleware:
+    """Per-route-class concurrency limits in front of the application.
+
+    Requests over a class's limit wait in its queue for up to queue_timeout
+    seconds; when the queue is full or the wait runs out they get 503 with
+    Retry-After, so slow analytics cannot starve the cheap lookups.
+    """
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        name = route_class(scope['method'], scope['path'])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.controller.limiters[name]
+        if not await limiter.acquire():
+            await self._reject(send, name)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    async def _reject(self, send, name: str):
+        body = json.dumps({'detail': f'Too many {name} requests in flight, retry later'}).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': 503,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'retry-after', str(self.controller.retry_after).encode()),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': body})
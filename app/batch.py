@@ -0,0 +1,157 @@
+import json
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from starlette.middleware.exceptions import ExceptionMiddleware
+
+from . import crud
+from .admission import AdmissionController, route_class
+from .cache import ResponseCache
+from .compression import CACHEABLE_PREFIXES, cache_key
+
+try:
+    # Holds the exit stack for yield dependencies like get_db (FastAPI 0.74 to 0.105)
+    from fastapi.middleware.asyncexitstack import AsyncExitStackMiddleware
+except ImportError:
+    AsyncExitStackMiddleware = None
+
+# Batches don't nest and the change stream never finishes
+EXCLUDED_PREFIXES = ('/batch', '/changes/stream')
+# Describe the batch request's own body, not the sub-request's
+DROPPED_HEADERS = (b'content-length', b'content-type', b'transfer-encoding', b'accept-encoding')
+
+
+class SubResponse:
+    def __init__(self, status: int, headers: List[Tuple[bytes, bytes]], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def encode(self, path: str) -> bytes:
+        """JSON for the batch payload; a JSON body is spliced in as is rather than parsed and re-encoded"""
+        headers = {}
+        content_type = ''
+        for name, value in self.headers:
+            name, value = name.decode('latin-1'), value.decode('latin-1')
+            if name == 'content-type':
+                content_type = value
+            elif name != 'content-length':
+                headers[name] = value
+        if content_type.startswith('application/json') and self.body:
+            body = self.body
+        else:
+            body = json.dumps(self.body.decode('utf-8', 'replace') or None).encode()
+        head = json.dumps({'path': path, 'status': self.status, 'headers': headers})
+        return head[:-1].encode() + b', "body": ' + body + b'}'
+
+
+def error(status: int, detail: str, headers: Iterable[Tuple[bytes, bytes]] = ()) -> SubResponse:
+    headers = [(b'content-type', b'application/json'), *headers]
+    return SubResponse(status, headers, json.dumps({'detail': detail}).encode())
+
+
+def begin_snapshot(db: Session):
+    """Start the session's transaction so every sub-request reads the same snapshot.
+
+    PostgreSQL only: REPEATABLE READ fixes the snapshot at the first query,
+    and READ ONLY keeps GET handlers from writing through the shared session.
+    The sync timestamp has to be read before that snapshot exists, so it is
+    read in a transaction of its own first and pinned on the session.
+    """
+    if db.get_bind().dialect.name == 'postgresql':
+        db.info.pop(crud.SYNC_TIMESTAMP_KEY, None)
+        sync_timestamp = crud.get_sync_timestamp(db)
+        db.commit()
+        db.info[crud.SYNC_TIMESTAMP_KEY] = sync_timestamp
+        db.execute(text("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY"))
+
+
+class BatchDispatcher:
+    """Runs GET sub-requests through the application's routes in process.
+
+    Sub-requests skip the middleware stack but go through the route's
+    dependencies and the exception handlers, so each gets the status and
+    body it would get on its own. The batch itself holds one read slot;
+    sub-requests of any other route class take a slot of their own class
+    (or get 503), and analytics ones are served from and stored in the
+    analytics cache, as they would be outside a batch.
+    """
+
+    def __init__(
+        self,
+        app,
+        admission: Optional[AdmissionController] = None,
+        cache: Optional[ResponseCache] = None
+    ):
+        routes = app.router
+        if AsyncExitStackMiddleware is not None:
+            routes = AsyncExitStackMiddleware(routes)
+        self.app = ExceptionMiddleware(routes, handlers=app.exception_handlers)
+        self.admission = admission
+        self.cache = cache
+
+    async def run(self, parent_scope: dict, path: str) -> SubResponse:
+        url = urlsplit(path)
+        if url.scheme or url.netloc or not url.path.startswith('/'):
+            return error(400, "Sub-request path must be an absolute path like /professors/1")
+        if url.path.startswith(EXCLUDED_PREFIXES):
+            return error(400, f"{url.path} cannot be batched")
+
+        scope = {
+            'type': 'http',
+            'asgi': parent_scope.get('asgi', {'version': '3.0'}),
+            'http_version': parent_scope.get('http_version', '1.1'),
+            'method': 'GET',
+            'scheme': parent_scope.get('scheme', 'http'),
+            'server': parent_scope.get('server'),
+            'client': parent_scope.get('client'),
+            'root_path': parent_scope.get('root_path', ''),
+            'path': unquote(url.path),
+            'raw_path': url.path.encode(),
+            'query_string': url.query.encode(),
+            'headers': [(k, v) for k, v in parent_scope['headers'] if k not in DROPPED_HEADERS],
+            'app': parent_scope.get('app'),
+            'state': {},
+        }
+        cacheable = self.cache is not None and scope['path'].startswith(CACHEABLE_PREFIXES)
+        key = cache_key(scope) if cacheable else None
+        entry = self.cache.get(key) if key is not None else None
+        if entry is not None:
+            return SubResponse(entry.status, entry.headers, entry.body)
+
+        name = route_class('GET', scope['path'])
+        limiter = None
+        if self.admission is not None and name not in (None, 'reads'):
+            limiter = self.admission.limiters[name]
+            if not await limiter.acquire():
+                retry_after = str(self.admission.retry_after).encode()
+                return error(503, f'Too many {name} requests in flight, retry later', [(b'retry-after', retry_after)])
+        try:
+            response = await self._dispatch(scope)
+        finally:
+            if limiter is not None:
+                limiter.release()
+        if key is not None and response.status == 200:
+            self.cache.set(key, response.status, response.headers, response.body)
+        return response
+
+    async def _dispatch(self, scope: dict) -> SubResponse:
+        status, headers, body = 500, [], []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            nonlocal status, headers
+            if message['type'] == 'http.response.start':
+                status, headers = message['status'], list(message.get('headers', []))
+            elif message['type'] == 'http.response.body':
+                body.append(message.get('body', b''))
+
+        try:
+            await self.app(scope, receive, send)
+        except Exception:
+            return error(500, "Internal Server Error")
+        return SubResponse(status, headers, b''.join(body))
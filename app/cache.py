@@ -0,0 +1,51 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+class CachedResponse:
+    def __init__(self, status: int, headers: List[Tuple[bytes, bytes]], body: bytes, expires_at: float):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.expires_at = expires_at
+        # Encoded bodies keyed by content-coding, filled on first request for each
+        self.encoded: Dict[str, bytes] = {}
+
+
+class ResponseCache:
+    """Thread-safe LRU of response bodies with a per-entry TTL."""
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, status: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> CachedResponse:
+        entry = CachedResponse(status, headers, body, time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
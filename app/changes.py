@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import crud
+from .cache import ResponseCache
+from .database import SessionLocal
+
+CHANGE_CHECK_INTERVAL = 5.0
+# Past this many events a full reload is cheaper than refreshing row by row
+MAX_CATCH_UP_EVENTS = 500
+
+
+class ChangeTail:
+    """Follows the change feed on behalf of an in-memory index.
+
+    Write endpoints update this process's indexes directly; writes made by
+    other workers only show up in change_event. seq order is commit order
+    (see crud.record_change), so remembering the last seq applied is enough
+    to catch up without gaps.
+    """
+
+    def __init__(self, entities: Tuple[str, ...], check_interval: float = CHANGE_CHECK_INTERVAL):
+        self.entities = entities
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._checked_at = 0.0
+
+    def start(self, db: Session):
+        """Call before a full load reads its rows; events after this point are replayed on top"""
+        # Pruning can empty the table; the pruned seqs were applied by the load all the same
+        seq = max(crud.get_latest_change_seq(db), crud.get_pruned_through_seq(db))
+        with self._lock:
+            self._seq = seq
+            self._checked_at = time.monotonic()
+
+    def poll(self, db: Session) -> Optional[List[Tuple[str, int]]]:
+        """(entity, entity_id) pairs changed since the last poll; None when a full reload is due.
+
+        Returns [] without querying until check_interval has passed.
+        """
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return []
+            self._checked_at = time.monotonic()
+            since = self._seq
+        if since < crud.get_pruned_through_seq(db):
+            # Events we have not applied yet may have been pruned
+            return None
+        events = crud.get_changed_entities(db, self.entities, since, MAX_CATCH_UP_EVENTS + 1)
+        if len(events) > MAX_CATCH_UP_EVENTS:
+            return None
+        if events:
+            with self._lock:
+                self._seq = max(self._seq, events[-1][0])
+        return sorted({(entity, entity_id) for _, entity, entity_id in events})
+
+
+async def clear_on_changes(cache: ResponseCache, changes: ChangeTail):
+    """Clear `cache` whenever the change feed moves past what it has seen.
+
+    The worker that handles a write clears its own cache straight away; this
+    is how the other workers notice, within changes.check_interval. Runs as a
+    task for the life of the worker.
+    """
+    def changed() -> bool:
+        db = SessionLocal()
+        try:
+            return changes.poll(db) != []
+        finally:
+            db.close()
+
+    def start():
+        db = SessionLocal()
+        try:
+            changes.start(db)
+        finally:
+            db.close()
+
+    await run_in_threadpool(start)
+    while True:
+        await asyncio.sleep(changes.check_interval)
+        try:
+            stale = await run_in_threadpool(changed)
+        except Exception:
+            # Database unreachable for now; entries still expire by TTL, try again next interval
+            continue
+        if stale:
+            cache.clear()
@@ -0,0 +1,153 @@
+import asyncio
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Awaitable, Callable, Dict, Tuple, TypeVar
+from urllib.parse import parse_qsl, urlencode
+
+T = TypeVar('T')
+
+# Job polling long-polls and the stream never ends, so neither is shared
+EXEMPT_PREFIXES = ('/internal/', '/changes/stream', '/jobs/')
+# A request asking for its own profile (profiling.PROFILE_HEADER) has to run, not
+# share another's response with someone else's X-Profile-Id or none at all
+UNSHARED_HEADERS = (b'x-profile',)
+
+
+class LeaderAbandoned(Exception):
+    """The caller doing the work was cancelled before it had a result"""
+
+
+class SingleFlight:
+    """Runs one call per key at a time and gives its result to every concurrent caller.
+
+    Usable from threads (`do`) and from the event loop (`do_async`); both
+    share the same in-flight calls. A caller that waits longer than `timeout`
+    for someone else's call gives up on it and runs its own.
+    """
+
+    def __init__(self, timeout: float = 10.0):
+        self.timeout = timeout
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.timeouts = 0
+
+    def _claim(self, key: str) -> Tuple[Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.followers += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.leaders += 1
+            return future, True
+
+    def _settle(self, key: str, future: Future, result=None, error: BaseException = None):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        future, leader = self._claim(key)
+        if leader:
+            try:
+                result = fn()
+            except Exception as e:
+                self._settle(key, future, error=e)
+                raise
+            except BaseException:
+                self._settle(key, future, error=LeaderAbandoned())
+                raise
+            self._settle(key, future, result)
+            return result
+        try:
+            return future.result(timeout=self.timeout)
+        except (FutureTimeout, LeaderAbandoned):
+            with self._lock:
+                self.timeouts += 1
+            return fn()
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        future, leader = self._claim(key)
+        if leader:
+            try:
+                result = await fn()
+            except Exception as e:
+                self._settle(key, future, error=e)
+                raise
+            except BaseException:
+                self._settle(key, future, error=LeaderAbandoned())
+                raise
+            self._settle(key, future, result)
+            return result
+        try:
+            # shield: timing out must not cancel the shared future under the other callers
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except (asyncio.TimeoutError, LeaderAbandoned):
+            with self._lock:
+                self.timeouts += 1
+            return await fn()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'leaders': self.leaders,
+                'followers': self.followers,
+                'timeouts': self.timeouts,
+            }
+
+
+def request_key(scope) -> str:
+    """Route plus query parameters in a canonical order"""
+    query = scope.get('query_string', b'').decode('latin-1')
+    params = sorted(parse_qsl(query, keep_blank_values=True))
+    return scope['path'] + '?' + urlencode(params) if params else scope['path']
+
+
+class CoalescingMiddleware:
+    """Identical concurrent GETs share one execution and its response body.
+
+    The first caller's status, headers and body go to everyone who asked for
+    the same route and parameters while it was running. Responses are
+    buffered, so streaming routes belong in EXEMPT_PREFIXES. Requests with
+    one of UNSHARED_HEADERS always run on their own.
+    """
+
+    def __init__(self, app, single_flight: SingleFlight):
+        self.app = app
+        self.single_flight = single_flight
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] != 'GET' or scope['path'].startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        if any(name in UNSHARED_HEADERS for name, _ in scope['headers']):
+            await self.app(scope, receive, send)
+            return
+
+        async def run():
+            return await self._capture(scope, receive)
+
+        status, headers, body = await self.single_flight.do_async(request_key(scope), run)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _capture(self, scope, receive):
+        start = {}
+        chunks = []
+
+        async def collect(message):
+            if message['type'] == 'http.response.start':
+                start.update(message)
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+
+        await self.app(scope, receive, collect)
+        return start['status'], list(start.get('headers', [])), b''.join(chunks)
@@ -0,0 +1,171 @@
+import gzip
+from typing import List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from .admission import BATCH_PATH
+from .cache import CachedResponse, ResponseCache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+CACHEABLE_PREFIXES = ('/analytics/',)
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# POSTs that write no data: a batch of GETs, and submitting analytics jobs
+NON_WRITING_PREFIXES = (BATCH_PATH, '/jobs/')
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q-values"""
+    if not accept_encoding:
+        return None
+    offered = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        offered[coding.strip().lower()] = quality
+    candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best = None
+    for coding in candidates:
+        quality = offered.get(coding, offered.get('*', 0.0))
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (coding, quality)
+    return best[0] if best else None
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 5) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+def cache_key(scope) -> str:
+    query = scope.get('query_string', b'').decode('latin-1')
+    return scope['path'] + '?' + '&'.join(sorted(query.split('&'))) if query else scope['path']
+
+
+class CompressionMiddleware:
+    """Negotiated gzip/brotli compression for buffered responses.
+
+    GET responses under CACHEABLE_PREFIXES are also kept in `cache` (the
+    app's analytics cache) together with each compressed variant, so a repeat request skips both
+    the query and the compression. Any successful write clears that cache;
+    batches and job routes write nothing, so they leave it alone.
+    Streaming responses (more_body) pass through untouched.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 5,
+        cache: Optional[ResponseCache] = None
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache = cache if cache is not None else ResponseCache()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        method = scope['method']
+        encoding = negotiate_encoding(Headers(scope=scope).get('accept-encoding'))
+
+        if method not in SAFE_METHODS:
+            status = await self._forward(scope, receive, send, encoding)
+            if status is not None and status < 400 and not scope['path'].startswith(NON_WRITING_PREFIXES):
+                self.cache.clear()
+            return
+
+        if method == 'GET' and scope['path'].startswith(CACHEABLE_PREFIXES):
+            key = cache_key(scope)
+            entry = self.cache.get(key)
+            if entry is None:
+                status, headers, body = await self._capture(scope, receive)
+                if status != 200:
+                    await self._send(send, status, headers, body, encoding)
+                    return
+                entry = self.cache.set(key, status, headers, body)
+            await self._send_cached(send, entry, encoding)
+            return
+
+        await self._forward(scope, receive, send, encoding)
+
+    async def _capture(self, scope, receive):
+        start = {}
+        chunks = []
+
+        async def collect(message):
+            if message['type'] == 'http.response.start':
+                start.update(message)
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+
+        await self.app(scope, receive, collect)
+        return start['status'], list(start.get('headers', [])), b''.join(chunks)
+
+    async def _forward(self, scope, receive, send, encoding: Optional[str]) -> Optional[int]:
+        start = {}
+        streaming = False
+
+        async def wrapped_send(message):
+            nonlocal streaming
+            if message['type'] == 'http.response.start':
+                start.update(message)
+                return
+            if message['type'] != 'http.response.body' or streaming:
+                await send(message)
+                return
+            if message.get('more_body', False):
+                streaming = True
+                await send(start)
+                await send(message)
+                return
+            await self._send(send, start['status'], list(start.get('headers', [])), message.get('body', b''), encoding)
+
+        await self.app(scope, receive, wrapped_send)
+        return start.get('status')
+
+    def _should_compress(self, headers: MutableHeaders, body: bytes, encoding: Optional[str]) -> bool:
+        if encoding is None or len(body) < self.minimum_size or 'content-encoding' in headers:
+            return False
+        return headers.get('content-type', '').startswith(COMPRESSIBLE_TYPES)
+
+    async def _send(self, send, status: int, raw_headers: List[Tuple[bytes, bytes]], body: bytes, encoding: Optional[str]):
+        headers = MutableHeaders(raw=raw_headers)
+        if self._should_compress(headers, body, encoding):
+            body = compress(body, encoding, self.gzip_level, self.brotli_quality)
+            headers['content-encoding'] = encoding
+            headers.add_vary_header('Accept-Encoding')
+        headers['content-length'] = str(len(body))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers.raw})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _send_cached(self, send, entry: CachedResponse, encoding: Optional[str]):
+        headers = MutableHeaders(raw=list(entry.headers))
+        body = entry.body
+        if self._should_compress(headers, body, encoding):
+            encoded = entry.encoded.get(encoding)
+            if encoded is None:
+                encoded = compress(body, encoding, self.gzip_level, self.brotli_quality)
+                entry.encoded[encoding] = encoded
+            body = encoded
+            headers['content-encoding'] = encoding
+            headers.add_vary_header('Accept-Encoding')
+        headers['content-length'] = str(len(body))
+        await send({'type': 'http.response.start', 'status': entry.status, 'headers': headers.raw})
+        await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,105 @@
+from typing import Optional
+
+from pydantic import BaseSettings, validator
+
+
+class Settings(BaseSettings):
+    """Process settings, read from the environment and `.env`.
+
+    Nothing here connects to the database; engines are created from these
+    values on first use in each process.
+    """
+
+    db_user: str = ''
+    db_password: str = ''
+    db_host: str = 'localhost'
+    db_port: int = 5432
+    db_name: str = ''
+    # Overrides the DB_* parts when set
+    database_url: Optional[str] = None
+
+    # Size the pool (size + overflow) for everything that holds a connection at
+    # once: the admission concurrency limits together, plus analytics_job_workers.
+    # The defaults add up to 8 + 3 + 3 + 1 + 4 = 19.
+    db_pool_size: int = 5
+    db_max_overflow: int = 14
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = -1
+    db_pool_pre_ping: bool = False
+
+    # Open pool connections and run the hot queries once before serving
+    warmup: bool = False
+    warmup_connections: Optional[int] = None
+
+    cors_origins: str = 'http://localhost:5173'
+
+    # Admission control: concurrent requests and wait-queue length per route class.
+    # The concurrency limits and the job workers together should not exceed the pool.
+    admission_enabled: bool = True
+    admission_reads_concurrency: int = 8
+    admission_reads_queue: int = 64
+    admission_writes_concurrency: int = 3
+    admission_writes_queue: int = 16
+    admission_analytics_concurrency: int = 3
+    admission_analytics_queue: int = 8
+    admission_exports_concurrency: int = 1
+    admission_exports_queue: int = 4
+    admission_queue_timeout: float = 5
+
+    # Identical concurrent GETs share one execution; followers wait this long before running their own
+    coalesce_enabled: bool = True
+    coalesce_timeout: float = 10
+
+    # Background analytics jobs: threads (each holds a connection while it runs, outside
+    # admission control), queued jobs before 503, and seconds results are kept
+    analytics_job_workers: int = 4
+    analytics_job_max_pending: int = 100
+    analytics_job_retention: float = 600
+
+    # POST /internal/changes/prune deletes change events older than this. Syncs and
+    # change feed reads that reach back further get 410 and have to reload in full.
+    change_retention_days: int = 30
+
+    # Most GET sub-requests one POST /batch may carry
+    batch_max_requests: int = 20
+
+    # Responses of at least compression_min_size bytes are compressed; GET /analytics/*
+    # responses are cached for analytics_cache_ttl seconds
+    compression_min_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 5
+    analytics_cache_ttl: float = 60
+
+    # Opt-in profiling: requests sent with `X-Profile: <profiling_token>`, plus a
+    # profiling_sample_rate fraction of all requests, run under cProfile. Nothing
+    # is installed while profiling_enabled is false.
+    profiling_enabled: bool = False
+    profiling_token: Optional[str] = None
+    profiling_sample_rate: float = 0.0
+    profiling_dir: str = 'profiles'
+    profiling_max_profiles: int = 200
+
+    @validator('profiling_token', always=True)
+    def _profiling_needs_token(cls, token, values):
+        # The profile endpoints show internals and SQL; they are never open
+        if values.get('profiling_enabled') and not token:
+            raise ValueError('PROFILING_TOKEN is required when PROFILING_ENABLED is true')
+        return token
+
+    @validator('change_retention_days')
+    def _retention_positive(cls, days):
+        if days < 1:
+            raise ValueError('CHANGE_RETENTION_DAYS must be at least 1')
+        return days
+
+    class Config:
+        env_file = '.env'
+
+    @property
+    def sqlalchemy_database_url(self) -> str:
+        if self.database_url:
+            return self.database_url
+        return (
+            f"postgresql://{self.db_user}:{self.db_password}@"
+            f"{self.db_host}:{self.db_port}/{self.db_name}"
+        )
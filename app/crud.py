@@ -1,32 +1,471 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, select
+from sqlalchemy.orm import Session, configure_mappers, joinedload, load_only, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy import and_, or_, bindparam, func, inspect, select, case, delete, insert, update, literal, literal_column, cast, true, tuple_, union_all, Date, Integer, Numeric
 from sqlalchemy.sql import text
-from typing import List, Tuple
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, List, Optional, Tuple
 from . import models
 
-def get_professor(db: Session, professor_id: int):
-    return db.query(models.Professor).filter(models.Professor.professor_id == professor_id).first()
+def _field_spec(model, derived: dict) -> dict:
+    spec = {attr.key: ([attr.key], []) for attr in inspect(model).column_attrs}
+    spec.update(derived)
+    return spec
 
-def get_all_professors(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Professor).offset(skip).limit(limit).all()
+# Response field -> (column attributes it reads, loader options it needs)
+FIELD_SPECS = {
+    models.Professor: _field_spec(models.Professor, {
+        'department': (['department_id'], []),
+        'research_areas': ([], [selectinload(models.Professor.research_areas)]),
+    }),
+    models.GradStudent: _field_spec(models.GradStudent, {
+        'advisor': (
+            ['advisor_id'],
+            [joinedload(models.GradStudent.advisor).load_only(
+                models.Professor.first_name, models.Professor.last_name
+            )]
+        ),
+        'department': (['department_id'], []),
+        'research_areas': ([], [selectinload(models.GradStudent.research_areas)]),
+    }),
+    models.Project: _field_spec(models.Project, {
+        'lead_professor': (
+            ['lead_professor_id'],
+            [joinedload(models.Project.lead_professor).load_only(
+                models.Professor.first_name, models.Professor.last_name
+            )]
+        ),
+        'department': (['department_id'], []),
+        'professors': ([], [
+            selectinload(models.Project.professor_associations)
+            .joinedload(models.ProfessorProject.professor)
+        ]),
+        'students': ([], [
+            selectinload(models.Project.student_associations)
+            .joinedload(models.StudentProject.student)
+        ]),
+    }),
+    models.Publication: _field_spec(models.Publication, {
+        'journal': (['journal_id'], []),
+        'authors': ([], [
+            selectinload(models.Publication.professor_authors).joinedload(models.ProfessorAuthor.professor),
+            selectinload(models.Publication.student_authors).joinedload(models.StudentAuthor.student)
+        ]),
+    }),
+}
 
-def get_student(db: Session, student_id: int):
-    return db.query(models.GradStudent).filter(models.GradStudent.student_id == student_id).first()
+def field_options(model, fields: Optional[List[str]]) -> list:
+    """Column-level loading for a sparse fieldset; relationships are loaded only if requested"""
+    if not fields:
+        return []
+    mapper = inspect(model)
+    columns = [mapper.get_property_by_column(c).key for c in mapper.primary_key]
+    if mapper.version_id_col is not None:
+        # Always loaded for the ETag
+        columns.append(mapper.get_property_by_column(mapper.version_id_col).key)
+    options = []
+    for field in fields:
+        field_columns, field_loaders = FIELD_SPECS[model][field]
+        columns.extend(c for c in field_columns if c not in columns)
+        options.extend(field_loaders)
+    return [load_only(*[getattr(model, c) for c in columns]), *options]
 
-def get_all_students(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.GradStudent).offset(skip).limit(limit).all()
+SYNC_ENTITIES = {
+    models.Professor: 'professor',
+    models.GradStudent: 'student',
+    models.Project: 'project',
+    models.Publication: 'publication',
+}
 
-def get_project(db: Session, project_id: int):
-    return db.query(models.Project).filter(models.Project.project_id == project_id).first()
+def sync_filters(model, updated_since: Optional[datetime]) -> list:
+    # Inclusive: rows stamped exactly at the cursor may have committed after the last sync read them
+    return [model.updated_at >= updated_since] if updated_since is not None else []
 
-def get_all_projects(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Project).offset(skip).limit(limit).all()
+def sync_query(query, model, updated_since: Optional[datetime]):
+    """Rows changed after updated_since, in a stable order for paging"""
+    if updated_since is None:
+        return query
+    return query.filter(*sync_filters(model, updated_since)).order_by(
+        model.updated_at, *inspect(model).primary_key
+    )
+
+def get_deleted_ids(db: Session, model, since: datetime) -> List[int]:
+    """Tombstones for an entity, read from the change outbox"""
+    rows = (
+        db.query(models.ChangeEvent.entity_id)
+        .filter(
+            models.ChangeEvent.entity == SYNC_ENTITIES[model],
+            models.ChangeEvent.op == 'delete',
+            models.ChangeEvent.created_at >= since
+        )
+        .order_by(models.ChangeEvent.seq)
+        .all()
+    )
+    return [entity_id for entity_id, in rows]
+
+# Session.info key for a sync timestamp read before the session's snapshot (see batch.begin_snapshot)
+SYNC_TIMESTAMP_KEY = 'sync_timestamp'
+
+# Sessions idle in a transaction for longer than this no longer hold sync cursors back
+SYNC_IDLE_TRANSACTION_LIMIT = 300
+
+SYNC_TIMESTAMP = text(
+    "SELECT least(now(), (SELECT min(xact_start) FROM pg_stat_activity"
+    " WHERE datname = current_database() AND usename = current_user"
+    " AND backend_type = 'client backend' AND pid <> pg_backend_pid()"
+    " AND NOT (state LIKE 'idle in transaction%' AND state_change < now() - make_interval(secs => :idle_limit))))"
+)
+
+def get_sync_timestamp(db: Session) -> datetime:
+    """The updated_since for the client's next sync; read it before the rows.
+
+    updated_at is now() of the writing transaction, which is when it started,
+    not when it commits. A transaction open right now can still commit rows
+    stamped before our now(), so on PostgreSQL the cursor stops at the start of
+    the oldest open transaction instead. Only the app's own transactions count
+    (same database and role), and not ones left idle for longer than
+    SYNC_IDLE_TRANSACTION_LIMIT seconds: a leaked session would otherwise hold
+    every client's cursor back for as long as it stays open. The price is that
+    such a session, should it commit a write after all, can be missed by
+    incremental sync.
+    """
+    pinned = db.info.get(SYNC_TIMESTAMP_KEY)
+    if pinned is not None:
+        return pinned
+    if db.get_bind().dialect.name != 'postgresql':
+        return db.execute(select(func.now())).scalar()
+    return db.execute(SYNC_TIMESTAMP, {'idle_limit': SYNC_IDLE_TRANSACTION_LIMIT}).scalar()
+
+# Pre-built statements for the hot reads. Each is constructed once and compiled
+# once into the engine's statement cache, so a call only binds its parameters
+# instead of rebuilding a Query chain.
+def _primary_key(model):
+    return inspect(model).primary_key[0]
+
+BY_ID_STATEMENTS = {
+    model: select(model).where(_primary_key(model) == bindparam('entity_id'))
+    for model in SYNC_ENTITIES
+}
+PAGE_STATEMENTS = {
+    model: select(model).offset(bindparam('skip')).limit(bindparam('limit'))
+    for model in SYNC_ENTITIES
+}
+BY_IDS_STATEMENTS = {
+    model: select(model).where(_primary_key(model).in_(bindparam('ids', expanding=True)))
+    for model in SYNC_ENTITIES
+}
+# Relationships the full multi-get response reads, loaded in a fixed number of queries
+MULTI_GET_STATEMENTS = {
+    models.Professor: BY_IDS_STATEMENTS[models.Professor].options(
+        selectinload(models.Professor.research_areas)
+    ),
+    models.GradStudent: BY_IDS_STATEMENTS[models.GradStudent].options(
+        joinedload(models.GradStudent.advisor),
+        selectinload(models.GradStudent.research_areas)
+    ),
+    models.Project: BY_IDS_STATEMENTS[models.Project].options(
+        joinedload(models.Project.lead_professor),
+        selectinload(models.Project.professor_associations).joinedload(models.ProfessorProject.professor),
+        selectinload(models.Project.student_associations).joinedload(models.StudentProject.student)
+    ),
+    models.Publication: BY_IDS_STATEMENTS[models.Publication].options(
+        selectinload(models.Publication.professor_authors).joinedload(models.ProfessorAuthor.professor),
+        selectinload(models.Publication.student_authors).joinedload(models.StudentAuthor.student)
+    ),
+}
+
+def _read_one(db: Session, model, entity_id: int, fields: Optional[List[str]]):
+    stmt = BY_ID_STATEMENTS[model]
+    if fields:
+        stmt = stmt.options(*field_options(model, fields))
+    return db.execute(stmt, {'entity_id': entity_id}).scalars().first()
+
+def _read_page(
+    db: Session, model, skip: int, limit: int, fields: Optional[List[str]], updated_since: Optional[datetime]
+):
+    stmt = sync_query(PAGE_STATEMENTS[model], model, updated_since)
+    if fields:
+        stmt = stmt.options(*field_options(model, fields))
+    return db.execute(stmt, {'skip': skip, 'limit': limit}).scalars().all()
+
+def _read_many(db: Session, model, ids: List[int], fields: Optional[List[str]]):
+    if fields:
+        stmt = BY_IDS_STATEMENTS[model].options(*field_options(model, fields))
+    else:
+        stmt = MULTI_GET_STATEMENTS[model]
+    return db.execute(stmt, {'ids': list(ids)}).scalars().all()
+
+def get_professor(db: Session, professor_id: int, fields: Optional[List[str]] = None):
+    return _read_one(db, models.Professor, professor_id, fields)
+
+def get_all_professors(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    fields: Optional[List[str]] = None,
+    updated_since: Optional[datetime] = None
+):
+    return _read_page(db, models.Professor, skip, limit, fields, updated_since)
+
+def get_student(db: Session, student_id: int, fields: Optional[List[str]] = None):
+    return _read_one(db, models.GradStudent, student_id, fields)
+
+def get_all_students(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    fields: Optional[List[str]] = None,
+    updated_since: Optional[datetime] = None
+):
+    return _read_page(db, models.GradStudent, skip, limit, fields, updated_since)
+
+def get_project(db: Session, project_id: int, fields: Optional[List[str]] = None):
+    return _read_one(db, models.Project, project_id, fields)
+
+def get_all_projects(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    fields: Optional[List[str]] = None,
+    updated_since: Optional[datetime] = None
+):
+    return _read_page(db, models.Project, skip, limit, fields, updated_since)
+
+def get_publication(db: Session, publication_id: int, fields: Optional[List[str]] = None):
+    return _read_one(db, models.Publication, publication_id, fields)
+
+def get_all_publications(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    fields: Optional[List[str]] = None,
+    updated_since: Optional[datetime] = None
+):
+    return _read_page(db, models.Publication, skip, limit, fields, updated_since)
+
+EXACT_COUNT_THRESHOLD = 10000
+
+def _estimate_rows(db: Session, model, filters) -> Optional[int]:
+    if not filters:
+        estimate = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table_name)"),
+            {'table_name': model.__tablename__}
+        ).scalar()
+    else:
+        stmt = select(*inspect(model).primary_key).where(*filters)
+        compiled = stmt.compile(dialect=db.get_bind().dialect)
+        plan = db.connection().exec_driver_sql(
+            "EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params
+        ).scalar()
+        estimate = plan[0]['Plan']['Plan Rows']
+    # reltuples is -1 for tables that have never been analyzed
+    return int(estimate) if estimate is not None and estimate >= 0 else None
 
-def get_publication(db: Session, publication_id: int):
-    return db.query(models.Publication).filter(models.Publication.publication_id == publication_id).first()
+def count_rows(db: Session, model, filters: Optional[list] = None) -> Tuple[int, bool]:
+    """Total for a paginated list as (count, exact), estimated from planner statistics when large"""
+    filters = filters or []
+    estimate = _estimate_rows(db, model, filters)
+    if estimate is not None and estimate > EXACT_COUNT_THRESHOLD:
+        return estimate, False
+    exact = db.execute(select(func.count()).select_from(model).where(*filters)).scalar()
+    return exact, True
 
-def get_all_publications(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Publication).offset(skip).limit(limit).all()
+def get_professors_by_ids(
+    db: Session, professor_ids: List[int], fields: Optional[List[str]] = None
+) -> List[models.Professor]:
+    return _read_many(db, models.Professor, professor_ids, fields)
+
+def get_students_by_ids(
+    db: Session, student_ids: List[int], fields: Optional[List[str]] = None
+) -> List[models.GradStudent]:
+    return _read_many(db, models.GradStudent, student_ids, fields)
+
+def get_projects_by_ids(
+    db: Session, project_ids: List[int], fields: Optional[List[str]] = None
+) -> List[models.Project]:
+    return _read_many(db, models.Project, project_ids, fields)
+
+def get_publications_by_ids(
+    db: Session, publication_ids: List[int], fields: Optional[List[str]] = None
+) -> List[models.Publication]:
+    return _read_many(db, models.Publication, publication_ids, fields)
+
+HOT_READS = (
+    (get_all_professors, get_professor, get_professors_by_ids),
+    (get_all_students, get_student, get_students_by_ids),
+    (get_all_projects, get_project, get_projects_by_ids),
+    (get_all_publications, get_publication, get_publications_by_ids),
+)
+
+def warm_statement_cache(db: Session):
+    """Run the list, detail and multi-get reads once so their compiled SQL is cached on the engine"""
+    configure_mappers()
+    for get_all, get_one, get_by_ids in HOT_READS:
+        rows = get_all(db, limit=1)
+        entity_id = inspect(rows[0]).identity[0] if rows else 0
+        get_one(db, entity_id)
+        get_by_ids(db, [entity_id])
+    get_changes(db, since=0, limit=1)
+    db.rollback()
+
+def _jsonable(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+# Advisory lock key serializing outbox writers. Lock order: OUTBOX_LOCK, then
+# any row write, then CITATION_METRICS_LOCK. Paths that write rows before their
+# record_change call take it up front with _lock_outbox.
+OUTBOX_LOCK = 7302
+
+def _lock_outbox(db: Session):
+    """A sequence hands out seq at insert, not at commit, so without this a reader
+    could see seq 11 committed while 10 is still in flight, move its cursor past
+    10 and never see it. Holding the lock from the insert until the transaction
+    ends makes seq order commit order. SQLite already allows only one writer."""
+    if db.get_bind().dialect.name == 'postgresql':
+        db.execute(select(func.pg_advisory_xact_lock(OUTBOX_LOCK)))
+
+def record_change(db: Session, entity: str, entity_id: int, op: str, data: Optional[dict] = None):
+    """Append an outbox event; it commits or rolls back together with the change itself"""
+    _lock_outbox(db)
+    db.add(models.ChangeEvent(
+        entity=entity,
+        entity_id=entity_id,
+        op=op,
+        data={key: _jsonable(value) for key, value in data.items()} if data else None
+    ))
+
+class VersionConflict(Exception):
+    """The row's version is not the one the caller based its change on"""
+
+    def __init__(self, current_version: Optional[int]):
+        super().__init__(current_version)
+        self.current_version = current_version
+
+UNVERSIONED_UPDATE_ATTEMPTS = 3
+
+def save_versioned(db: Session, model, entity_id: int, expected_version: Optional[int], apply):
+    """Load the row, check its version, `apply(row)` and commit; None if the row doesn't exist.
+
+    Versioned mappers UPDATE ... WHERE version = <version read>, so a row
+    changed by someone else since the read matches nothing and the flush
+    raises StaleDataError instead of overwriting it. With an expected version
+    that is a VersionConflict; without one the change is applied again to the
+    fresh row, so callers that don't send versions keep last-write-wins.
+    """
+    attempts = 1 if expected_version is not None else UNVERSIONED_UPDATE_ATTEMPTS
+    for _ in range(attempts):
+        instance = db.get(model, entity_id)
+        if instance is None:
+            return None
+        if expected_version is not None and instance.version != expected_version:
+            raise VersionConflict(instance.version)
+        try:
+            apply(instance)
+            db.commit()
+        except StaleDataError:
+            db.rollback()
+            continue
+        db.refresh(instance)
+        return instance
+    current = db.execute(select(model.version).where(_primary_key(model) == entity_id)).scalar()
+    if current is None:
+        # Deleted by someone else in the meantime
+        return None
+    raise VersionConflict(current)
+
+def delete_versioned(db: Session, model, entity_id: int, apply) -> bool:
+    """Load the row, `apply(row)` to delete it and commit; False if the row doesn't exist.
+
+    The DELETE is version-checked like an UPDATE, so it matches nothing when
+    the row changed since it was read. Deletes carry no expected version, so
+    they run again against the fresh row.
+    """
+    for _ in range(UNVERSIONED_UPDATE_ATTEMPTS):
+        instance = db.get(model, entity_id)
+        if instance is None:
+            return False
+        try:
+            apply(instance)
+            db.commit()
+        except StaleDataError:
+            db.rollback()
+            continue
+        return True
+    current = db.execute(select(model.version).where(_primary_key(model) == entity_id)).scalar()
+    if current is None:
+        return False
+    raise VersionConflict(current)
+
+def get_changes(db: Session, since: int = 0, limit: int = 100) -> List[models.ChangeEvent]:
+    return (
+        db.query(models.ChangeEvent)
+        .filter(models.ChangeEvent.seq > since)
+        .order_by(models.ChangeEvent.seq)
+        .limit(limit)
+        .all()
+    )
+
+CHANGE_RETENTION_ID = 1
+
+def prune_changes(db: Session, before: datetime) -> int:
+    """Delete outbox events created before `before`; returns how many were deleted.
+
+    The horizon is recorded in the same transaction, so readers that reach
+    back past it can tell that history is missing rather than empty.
+    """
+    try:
+        pruned_through = db.execute(
+            select(func.max(models.ChangeEvent.seq)).where(models.ChangeEvent.created_at < before)
+        ).scalar()
+        if pruned_through is None:
+            db.rollback()
+            return 0
+        retention = db.get(models.ChangeRetention, CHANGE_RETENTION_ID, with_for_update=True)
+        if retention is None:
+            db.add(models.ChangeRetention(
+                id=CHANGE_RETENTION_ID, pruned_before=before, pruned_through_seq=pruned_through
+            ))
+        else:
+            retention.pruned_before = max(retention.pruned_before, before)
+            retention.pruned_through_seq = max(retention.pruned_through_seq, pruned_through)
+        deleted = db.execute(
+            delete(models.ChangeEvent).where(models.ChangeEvent.created_at < before)
+        ).rowcount
+        db.commit()
+        return deleted
+    except Exception:
+        db.rollback()
+        raise
+
+def get_pruned_before(db: Session, since: datetime) -> Optional[datetime]:
+    """The retention horizon if events after `since` may have been pruned, else None"""
+    return db.execute(
+        select(models.ChangeRetention.pruned_before)
+        .where(models.ChangeRetention.id == CHANGE_RETENTION_ID, models.ChangeRetention.pruned_before > since)
+    ).scalar()
+
+def get_pruned_through_seq(db: Session) -> int:
+    """Highest seq that pruning may have deleted; 0 if nothing was pruned"""
+    seq = db.execute(
+        select(models.ChangeRetention.pruned_through_seq).where(models.ChangeRetention.id == CHANGE_RETENTION_ID)
+    ).scalar()
+    return seq or 0
+
+def get_latest_change_seq(db: Session) -> int:
+    return db.execute(select(func.coalesce(func.max(models.ChangeEvent.seq), 0))).scalar()
+
+def get_changed_entities(db: Session, entities: Iterable[str], since: int, limit: int) -> List[Tuple[int, str, int]]:
+    """(seq, entity, entity_id) of events after `since` for the given entities, in seq order"""
+    return db.execute(
+        select(models.ChangeEvent.seq, models.ChangeEvent.entity, models.ChangeEvent.entity_id)
+        .where(models.ChangeEvent.seq > since, models.ChangeEvent.entity.in_(list(entities)))
+        .order_by(models.ChangeEvent.seq)
+        .limit(limit)
+    ).all()
 
 def get_department_avg_funding(db: Session) -> List[Tuple[str, float]]:
     query = (
@@ -80,17 +519,33 @@ def get_avg_publications_per_professor(db: Session) -> float:
     
     return float(result) if result is not None else 0.0
 
-def get_inactive_professors(db: Session) -> List[models.Professor]:
-    subquery = (
-        db.query(models.Professor.professor_id)
-        .join(models.Project, models.Professor.professor_id == models.Project.lead_professor_id)
-        .filter(models.Project.status == 'Active')
-        .subquery()
+# "Without X" analytics: NOT EXISTS anti-joins probing an index per row, a
+# stable primary-key order for paging, and relationships loaded per page
+PROFESSOR_ROW_OPTIONS = (
+    joinedload(models.Professor.department),
+    selectinload(models.Professor.research_areas),
+)
+STUDENT_ROW_OPTIONS = (
+    joinedload(models.GradStudent.department),
+    selectinload(models.GradStudent.research_areas),
+)
+
+def get_inactive_professors(db: Session, skip: int = 0, limit: int = 100) -> List[models.Professor]:
+    leads_active_project = (
+        select(literal(1))
+        .where(
+            models.Project.lead_professor_id == models.Professor.professor_id,
+            models.Project.status == 'Active'
+        )
+        .exists()
     )
-    
     query = (
         db.query(models.Professor)
-        .filter(~models.Professor.professor_id.in_(subquery))
+        .options(*PROFESSOR_ROW_OPTIONS)
+        .filter(~leads_active_project)
+        .order_by(models.Professor.professor_id)
+        .offset(skip)
+        .limit(limit)
     )
     return query.all()
 
@@ -106,6 +561,38 @@ def get_small_departments(db: Session) -> List[Tuple[str, int]]:
     )
     return query.all()
 
+FUZZY_SEARCH_PEOPLE = (
+    ('professor', models.Professor, models.Professor.professor_id),
+    ('student', models.GradStudent, models.GradStudent.student_id),
+)
+
+def full_name_expression(model):
+    # Same expression as the ix_*_full_name_trgm indexes, with a literal separator so they match
+    return model.first_name + literal_column("' '") + model.last_name
+
+def search_people_fuzzy(db: Session, query: str, limit: int = 10) -> List[Tuple[str, int, str, str, str, float]]:
+    """Trigram matches on full name or email, best first; PostgreSQL with pg_trgm only"""
+    if db.get_bind().dialect.name != 'postgresql':
+        return []
+    selects = []
+    for kind, model, id_column in FUZZY_SEARCH_PEOPLE:
+        full_name = full_name_expression(model)
+        selects.append(
+            select(
+                literal(kind).label('type'),
+                id_column.label('id'),
+                model.first_name,
+                model.last_name,
+                model.email,
+                func.greatest(func.similarity(full_name, query), func.similarity(model.email, query)).label('score')
+            )
+            .where(full_name.self_group().op('%')(query) | model.email.op('%')(query))
+        )
+    people = union_all(*selects).subquery()
+    return db.execute(
+        select(people).order_by(people.c.score.desc(), people.c.type, people.c.id).limit(limit)
+    ).all()
+
 def get_all_emails(db: Session) -> List[Tuple[str, str]]:
 
     professors = (
@@ -135,43 +622,39 @@ def get_all_emails(db: Session) -> List[Tuple[str, str]]:
     query = professors.union(students)
     return query.all()
 
-def get_students_without_projects(db: Session) -> List[models.GradStudent]:
-    subquery = (
-        db.query(models.StudentProject.student_id)
-        .distinct()
-        .subquery()
+def get_students_without_projects(db: Session, skip: int = 0, limit: int = 100) -> List[models.GradStudent]:
+    on_project = (
+        select(literal(1))
+        .where(models.StudentProject.student_id == models.GradStudent.student_id)
+        .exists()
     )
-    
     query = (
         db.query(models.GradStudent)
+        .options(*STUDENT_ROW_OPTIONS)
         .filter(
-            ~models.GradStudent.student_id.in_(subquery),
-            models.GradStudent.advisor_id.is_(None)
+            models.GradStudent.advisor_id.is_(None),
+            ~on_project
         )
+        .order_by(models.GradStudent.student_id)
+        .offset(skip)
+        .limit(limit)
     )
     return query.all()
 
-def update_student(db: Session, student_id: int, student_data: dict):
-    db_student = db.query(models.GradStudent).filter(
-        models.GradStudent.student_id == student_id
-    ).first()
-    
-    if db_student:
+def update_student(db: Session, student_id: int, student_data: dict, expected_version: Optional[int] = None):
+    def apply(db_student):
         for key, value in student_data.items():
             setattr(db_student, key, value)
-        db.commit()
-        db.refresh(db_student)
-    return db_student
+        record_change(db, 'student', student_id, 'update', student_data)
+
+    return save_versioned(db, models.GradStudent, student_id, expected_version, apply)
 
 def delete_student(db: Session, student_id: int) -> bool:
-    db_student = db.query(models.GradStudent).filter(
-        models.GradStudent.student_id == student_id
-    ).first()
-    if db_student:
+    def apply(db_student):
         db.delete(db_student)
-        db.commit()
-        return True
-    return False
+        record_change(db, 'student', student_id, 'delete')
+
+    return delete_versioned(db, models.GradStudent, student_id, apply)
 
 def get_publications_by_citations(db: Session, skip: int = 0, limit: int = 100):
     return (
@@ -182,6 +665,158 @@ def get_publications_by_citations(db: Session, skip: int = 0, limit: int = 100):
         .all()
     )
 
+CITATION_SCOPES = ('professor', 'department')
+CITATION_METRICS = ('h_index', 'i10_index', 'total_citations', 'publication_count')
+TOP_PUBLICATIONS = 10
+
+def _citation_sources(scope: str, entity_ids: Optional[Iterable[int]] = None):
+    citations = func.coalesce(models.Publication.citations, 0).label('citations')
+    if scope == 'professor':
+        entity = models.ProfessorAuthor.professor_id
+        query = (
+            select(entity.label('entity_id'), models.Publication.publication_id, citations)
+            .join(models.Publication, models.Publication.publication_id == models.ProfessorAuthor.publication_id)
+        )
+    else:
+        # A publication co-authored by several professors of one department counts once
+        entity = models.Professor.department_id
+        query = (
+            select(entity.label('entity_id'), models.Publication.publication_id, citations)
+            .join(models.ProfessorAuthor, models.ProfessorAuthor.professor_id == models.Professor.professor_id)
+            .join(models.Publication, models.Publication.publication_id == models.ProfessorAuthor.publication_id)
+            .where(entity.isnot(None))
+            .distinct()
+        )
+    if entity_ids is not None:
+        query = query.where(entity.in_(list(entity_ids)))
+    return query.subquery()
+
+def _refresh_citation_scope(db: Session, scope: str, entity_ids: Optional[Iterable[int]] = None):
+    if entity_ids is not None:
+        entity_ids = list(entity_ids)
+        if not entity_ids:
+            return
+
+    for table in (models.CitationMetrics, models.CitationTopPublication):
+        stmt = delete(table).where(table.scope == scope)
+        if entity_ids is not None:
+            stmt = stmt.where(table.entity_id.in_(entity_ids))
+        db.execute(stmt)
+
+    source = _citation_sources(scope, entity_ids)
+    ranked = (
+        select(
+            source.c.entity_id,
+            source.c.publication_id,
+            source.c.citations,
+            func.row_number().over(
+                partition_by=source.c.entity_id,
+                order_by=(source.c.citations.desc(), source.c.publication_id)
+            ).label('rank')
+        )
+        .subquery()
+    )
+
+    metrics = (
+        select(
+            literal(scope),
+            ranked.c.entity_id,
+            func.coalesce(func.max(case((ranked.c.citations >= ranked.c.rank, ranked.c.rank))), 0),
+            func.count(case((ranked.c.citations >= 10, 1))),
+            func.coalesce(func.sum(ranked.c.citations), 0),
+            func.count()
+        )
+        .group_by(ranked.c.entity_id)
+    )
+    db.execute(
+        insert(models.CitationMetrics).from_select(
+            ['scope', 'entity_id', 'h_index', 'i10_index', 'total_citations', 'publication_count'],
+            metrics
+        )
+    )
+
+    top = (
+        select(literal(scope), ranked.c.entity_id, ranked.c.rank, ranked.c.publication_id, ranked.c.citations)
+        .where(ranked.c.rank <= TOP_PUBLICATIONS)
+    )
+    db.execute(
+        insert(models.CitationTopPublication).from_select(
+            ['scope', 'entity_id', 'rank', 'publication_id', 'citations'],
+            top
+        )
+    )
+
+# Advisory lock key serializing citation metric refreshes
+CITATION_METRICS_LOCK = 7301
+
+def _lock_citation_metrics(db: Session):
+    """Refreshes delete and re-insert shared rows (a department's metrics, say), so
+    concurrent ones would deadlock or collide on the primary key. The lock is held
+    until the transaction ends."""
+    if db.get_bind().dialect.name == 'postgresql':
+        db.execute(select(func.pg_advisory_xact_lock(CITATION_METRICS_LOCK)))
+
+def refresh_citation_metrics(
+    db: Session,
+    professor_ids: Optional[Iterable[int]] = None,
+    department_ids: Optional[Iterable[int]] = None
+):
+    """Recompute citation metrics; with no IDs every professor and department is refreshed"""
+    _lock_citation_metrics(db)
+    if professor_ids is None and department_ids is None:
+        _refresh_citation_scope(db, 'professor')
+        _refresh_citation_scope(db, 'department')
+    else:
+        _refresh_citation_scope(db, 'professor', professor_ids or [])
+        _refresh_citation_scope(db, 'department', department_ids or [])
+
+def get_citation_owners(db: Session, publication_id: int) -> Tuple[List[int], List[int]]:
+    rows = (
+        db.query(models.ProfessorAuthor.professor_id, models.Professor.department_id)
+        .join(models.Professor, models.Professor.professor_id == models.ProfessorAuthor.professor_id)
+        .filter(models.ProfessorAuthor.publication_id == publication_id)
+        .all()
+    )
+    professor_ids = sorted({professor_id for professor_id, _ in rows})
+    department_ids = sorted({department_id for _, department_id in rows if department_id is not None})
+    return professor_ids, department_ids
+
+def get_citation_leaderboard(db: Session, scope: str, metric: str = 'h_index', limit: int = 10):
+    column = getattr(models.CitationMetrics, metric)
+    if scope == 'professor':
+        owner = models.Professor
+        owner_id = models.Professor.professor_id
+        name = func.concat(models.Professor.first_name, ' ', models.Professor.last_name)
+    else:
+        owner = models.Department
+        owner_id = models.Department.department_id
+        name = models.Department.name
+    return (
+        db.query(models.CitationMetrics, name.label('name'))
+        .outerjoin(owner, owner_id == models.CitationMetrics.entity_id)
+        .filter(models.CitationMetrics.scope == scope)
+        .order_by(column.desc(), models.CitationMetrics.entity_id)
+        .limit(limit)
+        .all()
+    )
+
+def get_citation_metrics(db: Session, scope: str, entity_id: int):
+    metrics = db.query(models.CitationMetrics).filter(
+        models.CitationMetrics.scope == scope,
+        models.CitationMetrics.entity_id == entity_id
+    ).first()
+    top_publications = (
+        db.query(models.CitationTopPublication, models.Publication.title)
+        .join(models.Publication)
+        .filter(
+            models.CitationTopPublication.scope == scope,
+            models.CitationTopPublication.entity_id == entity_id
+        )
+        .order_by(models.CitationTopPublication.rank)
+        .all()
+    )
+    return metrics, top_publications
+
 def get_yearly_trends(db: Session) -> dict:
     project_trends = (
         db.query(
@@ -207,6 +842,242 @@ def get_yearly_trends(db: Session) -> dict:
         'publications': {year: count for year, count in publication_trends}
     }
 
+TREND_DIMENSIONS = {
+    'projects': ('year', 'department', 'status', 'funding_source'),
+    'publications': ('year', 'department', 'journal'),
+}
+TREND_GROUPINGS = ('sets', 'rollup', 'cube')
+
+def get_trends(
+    db: Session,
+    entity: str,
+    dimensions: List[str],
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    grouping: str = 'sets',
+    date_field: str = 'start_date'
+) -> dict:
+    """Every requested breakdown in one GROUPING SETS / ROLLUP / CUBE statement"""
+    if entity == 'projects':
+        date_column = getattr(models.Project, date_field)
+        columns = {
+            'year': cast(func.extract('year', date_column), Integer),
+            'department': models.Department.name,
+            'status': models.Project.status,
+            'funding_source': models.Project.funding_source,
+        }
+        measures = [
+            func.count(models.Project.project_id).label('count'),
+            func.coalesce(func.sum(models.Project.funding_amount), 0).label('funding'),
+        ]
+        query = select().select_from(models.Project)
+        if 'department' in dimensions:
+            query = query.outerjoin(models.Department, models.Department.department_id == models.Project.department_id)
+        # Plain range predicates on the date column so an index on it can be used
+        if start is not None:
+            query = query.where(date_column >= start)
+        if end is not None:
+            query = query.where(date_column <= end)
+    else:
+        columns = {
+            'year': models.Publication.year,
+            'department': models.Department.name,
+            'journal': models.Journal.name,
+        }
+        measures = [func.count(models.Publication.publication_id.distinct()).label('count')]
+        query = select().select_from(models.Publication)
+        if 'department' not in dimensions:
+            measures.append(func.coalesce(func.sum(models.Publication.citations), 0).label('citations'))
+        else:
+            # One row per author, so only the distinct count stays exact across grouping sets
+            query = (
+                query
+                .outerjoin(models.ProfessorAuthor, models.ProfessorAuthor.publication_id == models.Publication.publication_id)
+                .outerjoin(models.Professor, models.Professor.professor_id == models.ProfessorAuthor.professor_id)
+                .outerjoin(models.Department, models.Department.department_id == models.Professor.department_id)
+            )
+        if 'journal' in dimensions:
+            query = query.outerjoin(models.Journal, models.Journal.journal_id == models.Publication.journal_id)
+        if start is not None:
+            query = query.where(models.Publication.year >= start.year)
+        if end is not None:
+            query = query.where(models.Publication.year <= end.year)
+
+    dims = [columns[name].label(name) for name in dimensions]
+    if grouping == 'rollup':
+        group_by = func.rollup(*dims)
+    elif grouping == 'cube':
+        group_by = func.cube(*dims)
+    else:
+        group_by = func.grouping_sets(*[tuple_(d) for d in dims], tuple_())
+
+    query = query.add_columns(*dims, func.grouping(*dims).label('grouping'), *measures).group_by(group_by)
+    rows = db.execute(query).all()
+
+    names = list(dimensions) + ['grouping'] + [m.name for m in measures]
+    result_columns = {name: [] for name in names}
+    for row in rows:
+        for name, value in zip(names, row):
+            if value is not None and name in ('funding', 'citations'):
+                value = float(value)
+            result_columns[name].append(value)
+    return {
+        'entity': entity,
+        'dimensions': list(dimensions),
+        'grouping': grouping,
+        'rows': len(rows),
+        'columns': result_columns
+    }
+
+def _funding_filters(department_id: Optional[int], status: Optional[str]) -> list:
+    filters = []
+    if department_id is not None:
+        filters.append(models.Project.department_id == department_id)
+    if status is not None:
+        filters.append(models.Project.status == status)
+    return filters
+
+def get_funding_percentiles(
+    db: Session,
+    percentiles: List[float],
+    by_department: bool = True,
+    department_id: Optional[int] = None,
+    status: Optional[str] = None
+) -> List[dict]:
+    """Funding distribution per department plus an overall row, from one GROUPING SETS query"""
+    amount = models.Project.funding_amount
+    measures = [
+        func.count(amount).label('count'),
+        func.min(amount).label('min'),
+        func.max(amount).label('max'),
+        func.avg(amount).label('mean'),
+        *[func.percentile_cont(p).within_group(amount).label(f'p{i}') for i, p in enumerate(percentiles)],
+    ]
+    query = select().select_from(models.Project).where(amount.is_not(None), *_funding_filters(department_id, status))
+    if by_department:
+        department = models.Department.name.label('department')
+        query = (
+            query
+            .outerjoin(models.Department, models.Department.department_id == models.Project.department_id)
+            .add_columns(department, func.grouping(department).label('grouping'), *measures)
+            .group_by(func.grouping_sets(tuple_(department), tuple_()))
+            .order_by(func.grouping(department), department)
+        )
+    else:
+        query = query.add_columns(literal(None).label('department'), literal(1).label('grouping'), *measures)
+
+    results = []
+    for row in db.execute(query).all():
+        if row.count == 0:
+            continue
+        results.append({
+            'department': row.department,
+            'overall': row.grouping == 1,
+            'count': row.count,
+            'min': float(row.min),
+            'max': float(row.max),
+            'mean': round(float(row.mean), 2),
+            'percentiles': {str(p): round(float(row._mapping[f'p{i}']), 2) for i, p in enumerate(percentiles)},
+        })
+    return results
+
+def get_funding_histogram(
+    db: Session,
+    buckets: int = 10,
+    low: Optional[float] = None,
+    high: Optional[float] = None,
+    department_id: Optional[int] = None,
+    status: Optional[str] = None
+) -> dict:
+    """Equal-width funding buckets via width_bucket; bounds default to the data's min and max"""
+    amount = models.Project.funding_amount
+    funded = (
+        select(amount.label('amount'))
+        .where(amount.is_not(None), *_funding_filters(department_id, status))
+        .cte('funded')
+    )
+    bounds = select(
+        func.coalesce(cast(literal(low), Numeric), func.min(funded.c.amount)).label('low'),
+        func.coalesce(cast(literal(high), Numeric), func.max(funded.c.amount)).label('high'),
+    ).cte('bounds')
+    # Bucket 0 is below `low`, buckets + 1 above `high`; the top edge itself counts in the last bucket
+    bucket = case(
+        (bounds.c.high <= bounds.c.low, 1),
+        (funded.c.amount == bounds.c.high, buckets),
+        else_=func.width_bucket(funded.c.amount, bounds.c.low, bounds.c.high, buckets)
+    )
+    counts = (
+        select(bucket.label('bucket'), func.count().label('count'))
+        .select_from(funded.join(bounds, true()))
+        .group_by(bucket)
+        .subquery()
+    )
+    series = select(func.generate_series(0, buckets + 1).label('bucket')).subquery()
+    rows = db.execute(
+        select(series.c.bucket, bounds.c.low, bounds.c.high, func.coalesce(counts.c.count, 0))
+        .select_from(
+            series.join(bounds, true()).outerjoin(counts, counts.c.bucket == series.c.bucket)
+        )
+        .order_by(series.c.bucket)
+    ).all()
+
+    if not rows or rows[0].low is None:
+        return {'low': low, 'high': high, 'below': 0, 'above': 0, 'buckets': []}
+    lower_bound, upper_bound = float(rows[0].low), float(rows[0].high)
+    width = (upper_bound - lower_bound) / buckets
+    histogram = {'low': lower_bound, 'high': upper_bound, 'below': 0, 'above': 0, 'buckets': []}
+    for number, _, _, count in rows:
+        if number == 0:
+            histogram['below'] = count
+        elif number == buckets + 1:
+            histogram['above'] = count
+        else:
+            histogram['buckets'].append({
+                'lower': round(lower_bound + width * (number - 1), 2),
+                'upper': round(lower_bound + width * number, 2),
+                'count': count,
+            })
+    return histogram
+
+MAX_FUNDING_MONTHS = 240
+
+def get_monthly_funding(
+    db: Session,
+    start: date,
+    end: date,
+    department_id: Optional[int] = None,
+    status: Optional[str] = None
+) -> List[dict]:
+    """Projects active and their total funding for each month from start to end, empty months included"""
+    one_month = literal_column("interval '1 month'")
+    months = select(
+        func.generate_series(
+            func.date_trunc('month', cast(literal(start), Date)),
+            func.date_trunc('month', cast(literal(end), Date)),
+            one_month
+        ).label('month')
+    ).subquery()
+    project = models.Project
+    active = and_(
+        project.start_date < months.c.month + one_month,
+        or_(project.end_date.is_(None), project.end_date >= months.c.month),
+        *_funding_filters(department_id, status)
+    )
+    rows = db.execute(
+        select(
+            cast(months.c.month, Date).label('month'),
+            func.count(project.project_id).label('active_projects'),
+            func.coalesce(func.sum(project.funding_amount), 0).label('active_funding')
+        )
+        .select_from(months.outerjoin(project, active))
+        .group_by(months.c.month)
+        .order_by(months.c.month)
+    ).all()
+    return [
+        {'month': month, 'active_projects': active_projects, 'active_funding': float(active_funding)}
+        for month, active_projects, active_funding in rows
+    ]
+
 def get_department_publications(db: Session) -> List[Tuple[str, int]]:
     prof_pubs = (
         db.query(
@@ -221,10 +1092,24 @@ def get_department_publications(db: Session) -> List[Tuple[str, int]]:
     
     return prof_pubs.all()
 
-def create_student(db: Session, student_data: dict) -> models.GradStudent:
+def create_student(
+    db: Session, student_data: dict, research_area_ids: Optional[List[int]] = None
+) -> models.GradStudent:
     db_student = models.GradStudent(**student_data)
+    if research_area_ids:
+        db_student.research_areas = (
+            db.query(models.ResearchArea)
+            .filter(models.ResearchArea.area_id.in_(research_area_ids))
+            .all()
+        )
     db.add(db_student)
     try:
+        _lock_outbox(db)
+        db.flush()
+        record_change(db, 'student', db_student.student_id, 'create', {
+            **student_data,
+            'research_areas': [area.area_id for area in db_student.research_areas]
+        })
         db.commit()
         db.refresh(db_student)
         return db_student
@@ -264,20 +1149,23 @@ def get_department_total_funding(db: Session) -> List[Tuple[str, float]]:
     )
     return query.all()
 
-def get_professors_without_publications(db: Session) -> List[models.Professor]:
-    subquery = (
-        db.query(models.ProfessorAuthor.professor_id)
-        .distinct()
-        .subquery()
+def get_professors_without_publications(db: Session, skip: int = 0, limit: int = 100) -> List[models.Professor]:
+    has_publication = (
+        select(literal(1))
+        .where(models.ProfessorAuthor.professor_id == models.Professor.professor_id)
+        .exists()
     )
-    
     query = (
         db.query(models.Professor)
-        .filter(~models.Professor.professor_id.in_(subquery))
+        .options(*PROFESSOR_ROW_OPTIONS)
+        .filter(~has_publication)
+        .order_by(models.Professor.professor_id)
+        .offset(skip)
+        .limit(limit)
     )
     return query.all()
 
-def get_professor_publication_counts(db: Session) -> List[Tuple[int, str, str, int]]:
+def get_professor_publication_counts(db: Session) -> List[Tuple[int, str, str, int, Optional[int]]]:
     subquery = (
         db.query(
             models.ProfessorAuthor.professor_id,
@@ -292,7 +1180,8 @@ def get_professor_publication_counts(db: Session) -> List[Tuple[int, str, str, i
             models.Professor.professor_id,
             models.Professor.first_name,
             models.Professor.last_name,
-            func.coalesce(subquery.c.pub_count, 0).label('publication_count')
+            func.coalesce(subquery.c.pub_count, 0).label('publication_count'),
+            models.Professor.department_id
         )
         .outerjoin(subquery, models.Professor.professor_id == subquery.c.professor_id)
         .order_by(func.coalesce(subquery.c.pub_count, 0).desc())
@@ -300,10 +1189,24 @@ def get_professor_publication_counts(db: Session) -> List[Tuple[int, str, str, i
     
     return query.all()
 
-def create_professor(db: Session, professor_data: dict) -> models.Professor:
+def create_professor(
+    db: Session, professor_data: dict, research_area_ids: Optional[List[int]] = None
+) -> models.Professor:
     db_professor = models.Professor(**professor_data)
+    if research_area_ids:
+        db_professor.research_areas = (
+            db.query(models.ResearchArea)
+            .filter(models.ResearchArea.area_id.in_(research_area_ids))
+            .all()
+        )
     db.add(db_professor)
     try:
+        _lock_outbox(db)
+        db.flush()
+        record_change(db, 'professor', db_professor.professor_id, 'create', {
+            **professor_data,
+            'research_areas': [area.area_id for area in db_professor.research_areas]
+        })
         db.commit()
         db.refresh(db_professor)
         return db_professor
@@ -311,32 +1214,28 @@ def create_professor(db: Session, professor_data: dict) -> models.Professor:
         db.rollback()
         raise e
 
-def update_professor(db: Session, professor_id: int, professor_data: dict):
-    db_professor = db.query(models.Professor).filter(
-        models.Professor.professor_id == professor_id
-    ).first()
-    
-    if db_professor:
+def update_professor(db: Session, professor_id: int, professor_data: dict, expected_version: Optional[int] = None):
+    def apply(db_professor):
         for key, value in professor_data.items():
             setattr(db_professor, key, value)
-        db.commit()
-        db.refresh(db_professor)
-    return db_professor
+        record_change(db, 'professor', professor_id, 'update', professor_data)
+
+    return save_versioned(db, models.Professor, professor_id, expected_version, apply)
 
 def delete_professor(db: Session, professor_id: int) -> bool:
-    db_professor = db.query(models.Professor).filter(
-        models.Professor.professor_id == professor_id
-    ).first()
-    if db_professor:
+    def apply(db_professor):
         db.delete(db_professor)
-        db.commit()
-        return True
-    return False
+        record_change(db, 'professor', professor_id, 'delete')
+
+    return delete_versioned(db, models.Professor, professor_id, apply)
 
 def create_project(db: Session, project_data: dict) -> models.Project:
     db_project = models.Project(**project_data)
     db.add(db_project)
     try:
+        _lock_outbox(db)
+        db.flush()
+        record_change(db, 'project', db_project.project_id, 'create', project_data)
         db.commit()
         db.refresh(db_project)
         return db_project
@@ -344,32 +1243,28 @@ def create_project(db: Session, project_data: dict) -> models.Project:
         db.rollback()
         raise e
 
-def update_project(db: Session, project_id: int, project_data: dict):
-    db_project = db.query(models.Project).filter(
-        models.Project.project_id == project_id
-    ).first()
-    
-    if db_project:
+def update_project(db: Session, project_id: int, project_data: dict, expected_version: Optional[int] = None):
+    def apply(db_project):
         for key, value in project_data.items():
             setattr(db_project, key, value)
-        db.commit()
-        db.refresh(db_project)
-    return db_project
+        record_change(db, 'project', project_id, 'update', project_data)
+
+    return save_versioned(db, models.Project, project_id, expected_version, apply)
 
 def delete_project(db: Session, project_id: int) -> bool:
-    db_project = db.query(models.Project).filter(
-        models.Project.project_id == project_id
-    ).first()
-    if db_project:
+    def apply(db_project):
         db.delete(db_project)
-        db.commit()
-        return True
-    return False
+        record_change(db, 'project', project_id, 'delete')
+
+    return delete_versioned(db, models.Project, project_id, apply)
 
 def create_publication(db: Session, publication_data: dict) -> models.Publication:
     db_publication = models.Publication(**publication_data)
     db.add(db_publication)
     try:
+        _lock_outbox(db)
+        db.flush()
+        record_change(db, 'publication', db_publication.publication_id, 'create', publication_data)
         db.commit()
         db.refresh(db_publication)
         return db_publication
@@ -377,24 +1272,201 @@ def create_publication(db: Session, publication_data: dict) -> models.Publicatio
         db.rollback()
         raise e
 
-def update_publication(db: Session, publication_id: int, publication_data: dict):
-    db_publication = db.query(models.Publication).filter(
-        models.Publication.publication_id == publication_id
-    ).first()
-    
-    if db_publication:
+def update_publication(
+    db: Session,
+    publication_id: int,
+    publication_data: dict,
+    expected_version: Optional[int] = None
+):
+    def apply(db_publication):
         for key, value in publication_data.items():
             setattr(db_publication, key, value)
-        db.commit()
-        db.refresh(db_publication)
-    return db_publication
+        record_change(db, 'publication', publication_id, 'update', publication_data)
+        if 'citations' in publication_data:
+            db.flush()
+            professor_ids, department_ids = get_citation_owners(db, publication_id)
+            refresh_citation_metrics(db, professor_ids, department_ids)
+
+    return save_versioned(db, models.Publication, publication_id, expected_version, apply)
 
 def delete_publication(db: Session, publication_id: int) -> bool:
-    db_publication = db.query(models.Publication).filter(
-        models.Publication.publication_id == publication_id
-    ).first()
-    if db_publication:
+    def apply(db_publication):
+        professor_ids, department_ids = get_citation_owners(db, publication_id)
         db.delete(db_publication)
+        record_change(db, 'publication', publication_id, 'delete')
+        db.flush()
+        refresh_citation_metrics(db, professor_ids, department_ids)
+
+    return delete_versioned(db, models.Publication, publication_id, apply)
+
+
+def get_missing_ids(db: Session, model, ids: Iterable[int]) -> List[int]:
+    ids = set(ids)
+    if not ids:
+        return []
+    pk = _primary_key(model)
+    found = set(db.execute(select(pk).where(pk.in_(ids))).scalars())
+    return sorted(ids - found)
+
+def _apply_association_diff(
+    db: Session, table, parent_key: str, member_key: str, parent_id: int,
+    existing: dict, desired: dict, value_key: str
+) -> bool:
+    """Bring one parent's rows in `table` from `existing` to `desired` ({member id: value}).
+
+    One batched statement per kind of change; rows whose value already matches are not touched.
+    """
+    removed = [member for member in existing if member not in desired]
+    added = [member for member in desired if member not in existing]
+    changed = [member for member in desired if member in existing and existing[member] != desired[member]]
+    if removed:
+        db.execute(
+            delete(table).where(table.c[parent_key] == parent_id, table.c[member_key].in_(removed))
+        )
+    if added:
+        db.execute(insert(table), [
+            {parent_key: parent_id, member_key: member, value_key: desired[member]} for member in added
+        ])
+    if changed:
+        db.execute(
+            update(table)
+            .where(table.c[parent_key] == bindparam('b_parent'), table.c[member_key] == bindparam('b_member'))
+            .values({value_key: bindparam('b_value')}),
+            [{'b_parent': parent_id, 'b_member': member, 'b_value': desired[member]} for member in changed]
+        )
+    return bool(removed or added or changed)
+
+def _existing_associations(db: Session, parts) -> dict:
+    """{kind: {member id: value}} for several association tables, read in one UNION ALL"""
+    rows = db.execute(union_all(*[
+        select(literal(kind).label('kind'), member.label('member'), value.label('value')).where(condition)
+        for kind, member, value, condition in parts
+    ])).all()
+    existing = {kind: {} for kind, _, _, _ in parts}
+    for kind, member, value in rows:
+        existing[kind][member] = value
+    return existing
+
+def _check_version(db: Session, model, entity_id: int, expected_version: Optional[int]) -> bool:
+    """False if the row is gone; VersionConflict if it is not at expected_version.
+
+    Called with the outbox lock held, so no other writer can move the version
+    before this transaction commits.
+    """
+    current = db.execute(select(model.version).where(_primary_key(model) == entity_id)).scalar()
+    if current is None:
+        return False
+    if expected_version is not None and current != expected_version:
+        raise VersionConflict(current)
+    return True
+
+def set_publication_authors(
+    db: Session, publication_id: int, authors: List[Tuple[str, int]], expected_version: Optional[int] = None
+) -> Optional[bool]:
+    """Replace the author list with `authors` [(type, id)] in author order.
+
+    False if nothing changed, None if the publication doesn't exist.
+    """
+    professor_authors = models.ProfessorAuthor.__table__
+    student_authors = models.StudentAuthor.__table__
+    desired = {'professor': {}, 'student': {}}
+    for order, (kind, member_id) in enumerate(authors, start=1):
+        desired[kind][member_id] = order
+
+    try:
+        # Before the first row write, in the order record_change takes it on the other paths
+        _lock_outbox(db)
+        if not _check_version(db, models.Publication, publication_id, expected_version):
+            db.rollback()
+            return None
+        existing = _existing_associations(db, [
+            ('professor', professor_authors.c.professor_id, professor_authors.c.author_order,
+             professor_authors.c.publication_id == publication_id),
+            ('student', student_authors.c.student_id, student_authors.c.author_order,
+             student_authors.c.publication_id == publication_id),
+        ])
+        # Citation metrics of authors dropped from the list change too
+        old_professors, old_departments = get_citation_owners(db, publication_id)
+        changed = _apply_association_diff(
+            db, professor_authors, 'publication_id', 'professor_id', publication_id,
+            existing['professor'], desired['professor'], 'author_order'
+        )
+        changed = _apply_association_diff(
+            db, student_authors, 'publication_id', 'student_id', publication_id,
+            existing['student'], desired['student'], 'author_order'
+        ) or changed
+        if not changed:
+            # Ends the transaction, and with it the outbox lock
+            db.rollback()
+            return False
+        _touch(db, models.Publication, publication_id)
+        record_change(db, 'publication', publication_id, 'update', {
+            'authors': [{'type': kind, 'id': member_id} for kind, member_id in authors]
+        })
+        db.flush()
+        new_professors, new_departments = get_citation_owners(db, publication_id)
+        refresh_citation_metrics(
+            db, sorted(set(old_professors) | set(new_professors)), sorted(set(old_departments) | set(new_departments))
+        )
+        db.commit()
+        return True
+    except Exception:
+        db.rollback()
+        raise
+
+def set_project_team(
+    db: Session,
+    project_id: int,
+    professors: List[Tuple[int, Optional[str]]],
+    students: List[Tuple[int, Optional[str]]],
+    expected_version: Optional[int] = None
+) -> Optional[bool]:
+    """Replace the project's participants with [(id, role)] lists.
+
+    False if nothing changed, None if the project doesn't exist.
+    """
+    professor_project = models.ProfessorProject.__table__
+    student_project = models.StudentProject.__table__
+    try:
+        # Before the first row write, in the order record_change takes it on the other paths
+        _lock_outbox(db)
+        if not _check_version(db, models.Project, project_id, expected_version):
+            db.rollback()
+            return None
+        existing = _existing_associations(db, [
+            ('professor', professor_project.c.professor_id, professor_project.c.role,
+             professor_project.c.project_id == project_id),
+            ('student', student_project.c.student_id, student_project.c.role,
+             student_project.c.project_id == project_id),
+        ])
+        changed = _apply_association_diff(
+            db, professor_project, 'project_id', 'professor_id', project_id,
+            existing['professor'], dict(professors), 'role'
+        )
+        changed = _apply_association_diff(
+            db, student_project, 'project_id', 'student_id', project_id,
+            existing['student'], dict(students), 'role'
+        ) or changed
+        if not changed:
+            # Ends the transaction, and with it the outbox lock
+            db.rollback()
+            return False
+        _touch(db, models.Project, project_id)
+        record_change(db, 'project', project_id, 'update', {
+            'professors': [{'id': member_id, 'role': role} for member_id, role in professors],
+            'students': [{'id': member_id, 'role': role} for member_id, role in students],
+        })
         db.commit()
         return True
-    return False
\ No newline at end of file
+    except Exception:
+        db.rollback()
+        raise
+
+def _touch(db: Session, model, entity_id: int):
+    # Core writes to association tables skip the ORM flush hook that bumps the parent.
+    # The parent's representation changed, so its version (the ETag) moves on too.
+    db.execute(
+        update(model.__table__)
+        .where(_primary_key(model) == entity_id)
+        .values(updated_at=func.now(), version=model.version + 1)
+    )
@@ -1,24 +1,102 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
 import os
+import threading
+from contextvars import ContextVar
+from typing import Optional
 
-load_dotenv()
-
-SQLALCHEMY_DATABASE_URL = (
-    f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@"
-    f"{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
-)
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import Session, sessionmaker
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from .config import Settings
 
 Base = declarative_base()
 
+_settings: Optional[Settings] = None
+_engine: Optional[Engine] = None
+_engine_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def configure(settings: Settings):
+    """Use these settings for engines created from now on in this process"""
+    global _settings, _engine, _engine_pid
+    with _lock:
+        if _engine is not None and _engine_pid == os.getpid():
+            _engine.dispose()
+        _settings = settings
+        _engine = None
+        _engine_pid = None
+
+
+def get_settings() -> Settings:
+    global _settings
+    if _settings is None:
+        _settings = Settings()
+    return _settings
+
+
+def get_engine() -> Engine:
+    """This process's engine, created on first use and again after a fork"""
+    global _engine, _engine_pid
+    pid = os.getpid()
+    if _engine is None or _engine_pid != pid:
+        with _lock:
+            if _engine is None or _engine_pid != pid:
+                if _engine is not None:
+                    # Inherited from the parent: drop its pool without closing the parent's sockets
+                    _engine.dispose(close=False)
+                settings = get_settings()
+                _engine = create_engine(
+                    settings.sqlalchemy_database_url,
+                    pool_size=settings.db_pool_size,
+                    max_overflow=settings.db_max_overflow,
+                    pool_timeout=settings.db_pool_timeout,
+                    pool_recycle=settings.db_pool_recycle,
+                    pool_pre_ping=settings.db_pool_pre_ping
+                )
+                _engine_pid = pid
+    return _engine
+
+
+def warm_pool(connections: int):
+    """Open `connections` pool connections up front so first requests don't pay for them"""
+    engine = get_engine()
+    opened = []
+    try:
+        for _ in range(connections):
+            conn = engine.connect()
+            opened.append(conn)
+            conn.execute(text("SELECT 1"))
+    finally:
+        for conn in opened:
+            conn.close()
+
+
+class _LazySessionmaker:
+    """sessionmaker bound to get_engine() at call time"""
+
+    def __init__(self, **kwargs):
+        self._factory = sessionmaker(**kwargs)
+
+    def __call__(self, **kwargs):
+        kwargs.setdefault('bind', get_engine())
+        return self._factory(**kwargs)
+
+
+SessionLocal = _LazySessionmaker(autocommit=False, autoflush=False)
+
+# Set while /batch runs its sub-requests, so they all use the batch's session
+shared_session: ContextVar[Optional[Session]] = ContextVar('shared_session', default=None)
+
 def get_db():
+    shared = shared_session.get()
+    if shared is not None:
+        # Owned and closed by the batch
+        yield shared
+        return
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,164 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+from .changes import ChangeTail
+
+# (kind, id) of an indexed person, kind is 'professor' or 'student'
+PersonKey = Tuple[str, int]
+
+PEOPLE = {
+    'professor': (models.Professor, models.Professor.professor_id),
+    'student': (models.GradStudent, models.GradStudent.student_id),
+}
+
+
+def normalize(text: str) -> str:
+    return ' '.join(text.casefold().split())
+
+
+def search_terms(first_name: str, last_name: str, email: str) -> List[str]:
+    """Strings a query may be a prefix of: either name, both name orders, the email"""
+    first, last = normalize(first_name), normalize(last_name)
+    terms = {first, last, f"{first} {last}", f"{last} {first}", normalize(email)}
+    terms.discard('')
+    return sorted(terms)
+
+
+class DirectoryIndex:
+    """Sorted prefix index over professor and student names and emails.
+
+    `_terms` is kept sorted with `_owners[i]` the person `_terms[i]` belongs
+    to, so a prefix lookup is one bisect plus a scan of the matching run.
+    Write endpoints refresh or remove single people as they change; other
+    workers' writes are replayed from the change feed on the next search.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._changes = ChangeTail(tuple(PEOPLE))
+        self._reset()
+
+    def _reset(self):
+        self._terms: List[str] = []
+        self._owners: List[PersonKey] = []
+        self._people: Dict[PersonKey, Tuple[str, str, str]] = {}
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self):
+        return len(self._people)
+
+    def load(self, db: Session):
+        self._changes.start(db)
+        people = {}
+        for kind, (model, id_column) in PEOPLE.items():
+            rows = db.execute(select(id_column, model.first_name, model.last_name, model.email)).all()
+            for entity_id, first_name, last_name, email in rows:
+                people[(kind, entity_id)] = (first_name, last_name, email)
+        entries = sorted(
+            (term, key)
+            for key, person in people.items()
+            for term in search_terms(*person)
+        )
+        with self._lock:
+            self._terms = [term for term, _ in entries]
+            self._owners = [key for _, key in entries]
+            self._people = people
+            self._loaded = True
+
+    def ensure_loaded(self, db: Session):
+        if not self._loaded:
+            self.load(db)
+            return
+        changed = self._changes.poll(db)
+        if changed is None:
+            self.load(db)
+            return
+        for kind, entity_id in changed:
+            self.refresh(db, kind, entity_id)
+
+    def _remove(self, key: PersonKey):
+        person = self._people.pop(key, None)
+        if person is None:
+            return
+        for term in search_terms(*person):
+            i = bisect_left(self._terms, term)
+            while i < len(self._terms) and self._terms[i] == term:
+                if self._owners[i] == key:
+                    del self._terms[i]
+                    del self._owners[i]
+                    break
+                i += 1
+
+    def _add(self, key: PersonKey, person: Tuple[str, str, str]):
+        self._people[key] = person
+        for term in search_terms(*person):
+            i = bisect_left(self._terms, term)
+            self._terms.insert(i, term)
+            self._owners.insert(i, key)
+
+    def refresh(self, db: Session, kind: str, entity_id: int):
+        if not self._loaded:
+            return
+        model, id_column = PEOPLE[kind]
+        row = db.execute(
+            select(model.first_name, model.last_name, model.email).where(id_column == entity_id)
+        ).first()
+        with self._lock:
+            self._remove((kind, entity_id))
+            if row is not None:
+                self._add((kind, entity_id), tuple(row))
+
+    def remove(self, kind: str, entity_id: int):
+        with self._lock:
+            self._remove((kind, entity_id))
+
+    def refresh_professor(self, db: Session, professor_id: int):
+        self.refresh(db, 'professor', professor_id)
+
+    def refresh_student(self, db: Session, student_id: int):
+        self.refresh(db, 'student', student_id)
+
+    def remove_professor(self, professor_id: int):
+        self.remove('professor', professor_id)
+
+    def remove_student(self, student_id: int):
+        self.remove('student', student_id)
+
+    def search(self, query: str, limit: int = 10, kind: Optional[str] = None) -> List[dict]:
+        """People with a name or email starting with `query`, ordered by the matched term"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        with self._lock:
+            i = bisect_left(self._terms, prefix)
+            while i < len(self._terms) and len(results) < limit:
+                if not self._terms[i].startswith(prefix):
+                    break
+                key = self._owners[i]
+                i += 1
+                if key in seen or (kind is not None and key[0] != kind):
+                    continue
+                seen.add(key)
+                first_name, last_name, email = self._people[key]
+                results.append({
+                    'type': key[0],
+                    'id': key[1],
+                    'name': f"{first_name} {last_name}",
+                    'email': email,
+                    'score': None
+                })
+        return results
+
+
+directory_index = DirectoryIndex()
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+
+from .config import Settings
+from .database import SessionLocal
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, name: str, params: dict, key: str):
+        self.job_id = uuid.uuid4().hex
+        self.name = name
+        self.params = params
+        self.key = key
+        self.status = 'queued'
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submitted_at = datetime.now(timezone.utc)
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.future = None
+        self._finished_monotonic: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ('succeeded', 'failed')
+
+
+class JobManager:
+    """Runs analytics on a bounded thread pool, each job on its own session.
+
+    Submitting a job identical to one still queued or running returns that
+    job instead of starting another. Finished jobs are kept for
+    `retention` seconds so clients can come back for the result.
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 100, retention: float = 600):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention = retention
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: Dict[str, Job] = {}
+        self._inflight: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> 'JobManager':
+        return cls(
+            settings.analytics_job_workers, settings.analytics_job_max_pending, settings.analytics_job_retention
+        )
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='analytics-job')
+        return self._executor
+
+    def submit(self, name: str, params: dict, fn: Callable) -> Job:
+        key = name + ':' + json.dumps(params, sort_keys=True, default=str)
+        with self._lock:
+            self._purge()
+            existing = self._inflight.get(key)
+            if existing is not None:
+                return self._jobs[existing]
+            if len(self._inflight) >= self.max_pending:
+                raise JobQueueFull()
+            job = Job(name, params, key)
+            self._jobs[job.job_id] = job
+            self._inflight[key] = job.job_id
+            job.future = self._pool().submit(self._run, job, fn)
+            return job
+
+    def _run(self, job: Job, fn: Callable):
+        job.status = 'running'
+        job.started_at = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            job.result = jsonable_encoder(fn(db=db, **job.params))
+            job.status = 'succeeded'
+        except HTTPException as e:
+            job.error = str(e.detail)
+            job.status = 'failed'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            db.close()
+            job.finished_at = datetime.now(timezone.utc)
+            job._finished_monotonic = time.monotonic()
+            with self._lock:
+                self._inflight.pop(job.key, None)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._purge()
+            return self._jobs.get(job_id)
+
+    async def wait(self, job: Job, timeout: float) -> Job:
+        """Wait on the event loop, not a thread; shielded so a timeout doesn't cancel the job"""
+        if not job.done and timeout > 0:
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job.future)), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    def _purge(self):
+        cutoff = time.monotonic() - self.retention
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job._finished_monotonic is not None and job._finished_monotonic < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {'workers': self.max_workers, 'in_flight': len(self._inflight), 'jobs': counts}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -1,23 +1,48 @@
+import asyncio
 from typing import List, Dict, Optional
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import APIRouter, FastAPI, Depends, Header, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import inspect
 from sqlalchemy.orm import Session
 from . import models, schemas, crud
-from datetime import date
-from .database import get_db
-from pydantic import BaseModel
+from datetime import date, datetime, timedelta, timezone
+from . import database, read_models
+from .config import Settings
+from .database import get_db, SessionLocal
+from .admission import AdmissionController, AdmissionMiddleware
+from .batch import BatchDispatcher, begin_snapshot
+from .cache import ResponseCache
+from .changes import ChangeTail, clear_on_changes
+from . import profiling
+from .profiling import Profiler, ProfilingMiddleware
+from .coalescing import CoalescingMiddleware, SingleFlight
+from .compression import CompressionMiddleware
+from .jobs import JobManager, JobQueueFull
+from .directory import directory_index
+from .matching import advisor_matcher
+from .reference import reference_cache
+from pydantic import BaseModel, ValidationError, parse_obj_as
 from fastapi.middleware.cors import CORSMiddleware
 
 
-app = FastAPI()
+async def refresh_reference_cache():
+    """Runs on every route, so it stays on the event loop: a clock check, and a
+    session (in the threadpool) only when the version check is due"""
+    if reference_cache.due():
+        await run_in_threadpool(check_reference_cache)
 
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173"],  # Frontend link 
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def check_reference_cache():
+    db = SessionLocal()
+    try:
+        reference_cache.ensure_fresh(db)
+    finally:
+        db.close()
+
+
+router = APIRouter()
 
 
 class DepartmentFunding(BaseModel):
@@ -63,6 +88,8 @@ class StudentUpdate(BaseModel):
     image_url: Optional[str] = None
     advisor_id: Optional[int] = None
     department_id: Optional[int] = None
+    # Version the change is based on, as an alternative to If-Match
+    version: Optional[int] = None
 
 class YearlyTrends(BaseModel):
     projects: Dict[int, int]
@@ -103,6 +130,8 @@ class ProfessorUpdate(BaseModel):
     office: Optional[str] = None
     image_url: Optional[str] = None
     department_id: Optional[int] = None
+    # Version the change is based on, as an alternative to If-Match
+    version: Optional[int] = None
 
 class ProjectCreate(BaseModel):
     title: str
@@ -125,6 +154,8 @@ class ProjectUpdate(BaseModel):
     description: Optional[str] = None
     lead_professor_id: Optional[int] = None
     department_id: Optional[int] = None
+    # Version the change is based on, as an alternative to If-Match
+    version: Optional[int] = None
 
 class PublicationCreate(BaseModel):
     title: str
@@ -145,6 +176,8 @@ class PublicationUpdate(BaseModel):
     pages: Optional[str] = None
     citations: Optional[int] = None
     abstract: Optional[str] = None
+    # Version the change is based on, as an alternative to If-Match
+    version: Optional[int] = None
 
 class ProfessorPublicationCount(BaseModel):
     professor_id: int
@@ -173,27 +206,215 @@ class DepartmentTotalFunding(BaseModel):
     total_funding: float
 
 
+MAX_MULTI_GET_IDS = 500
+
+def department_name(instance) -> Optional[str]:
+    if instance.department_id is None:
+        return None
+    name = reference_cache.department_name(instance.department_id)
+    if name is None and instance.department:
+        name = instance.department.name
+    return name
+
+def journal_name(publication: models.Publication) -> Optional[str]:
+    if publication.journal_id is None:
+        return None
+    name = reference_cache.journal_name(publication.journal_id)
+    if name is None and publication.journal:
+        name = publication.journal.name
+    return name
+
+def set_total_count(response: Response, total: int, exact: bool):
+    response.headers["X-Total-Count"] = str(total)
+    response.headers["X-Total-Count-Exact"] = "true" if exact else "false"
+
+def set_sync_headers(response: Response, db: Session, model, updated_since: datetime):
+    """Tombstones since the last sync, plus the timestamp to send as updated_since next time"""
+    pruned_before = crud.get_pruned_before(db, updated_since)
+    if pruned_before is not None:
+        # Tombstones older than the horizon are gone, so deletes since updated_since can't be listed
+        raise HTTPException(
+            status_code=410,
+            detail=f"Change history before {pruned_before.isoformat()} has been pruned; sync again without updated_since"
+        )
+    response.headers["X-Sync-Timestamp"] = crud.get_sync_timestamp(db).isoformat()
+    response.headers["X-Deleted-IDs"] = ",".join(
+        str(i) for i in crud.get_deleted_ids(db, model, updated_since)
+    )
+
+def column_values(instance) -> dict:
+    """Loaded column attributes only, so eager-loaded relationships don't clash with formatted fields"""
+    return {
+        attr.key: instance.__dict__[attr.key]
+        for attr in inspect(instance).mapper.column_attrs
+        if attr.key in instance.__dict__
+    }
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Version from an If-Match ETag ("3" or W/"3"); `*` matches any version"""
+    if if_match is None or if_match.strip() == '*':
+        return None
+    value = if_match.strip()
+    if value.startswith('W/'):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="If-Match must be a single ETag returned by this API")
+
+def etag(version: Optional[int]) -> str:
+    return f'"{version}"'
+
+def set_etag(response: Response, instance):
+    if isinstance(instance, dict):
+        version = instance.get('version')
+    else:
+        version = instance.__dict__.get('version')
+    if version is not None:
+        response.headers["ETag"] = etag(version)
+
+def expected_version(if_match: Optional[str], body_version: Optional[int]) -> Optional[int]:
+    """The version a write is based on, from If-Match or the body; None to skip the check"""
+    header_version = parse_if_match(if_match)
+    if body_version is not None and header_version is not None and body_version != header_version:
+        raise HTTPException(status_code=400, detail="If-Match and body version disagree")
+    return header_version if header_version is not None else body_version
+
+def versioned_update(update, db: Session, entity_id: int, changes: BaseModel, if_match: Optional[str]):
+    """Compare-and-swap update against the version in If-Match or the body; 409 when it has moved on"""
+    data = changes.dict(exclude_unset=True)
+    version = expected_version(if_match, data.pop('version', None))
+    try:
+        return update(db, entity_id, data, expected_version=version)
+    except crud.VersionConflict as e:
+        raise version_conflict(e)
+
+def versioned_delete(delete, db: Session, entity_id: int) -> bool:
+    """Delete that keeps losing races against updates gets 409 instead of a 500"""
+    try:
+        return delete(db, entity_id)
+    except crud.VersionConflict as e:
+        raise version_conflict(e)
+
+def version_conflict(e: crud.VersionConflict) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail=f"Modified by another request, current version is {e.current_version}",
+        headers={"ETag": etag(e.current_version)} if e.current_version is not None else None
+    )
+
+def person_name(person) -> Optional[str]:
+    return f"{person.first_name} {person.last_name}" if person else None
+
+def research_area_names(instance) -> List[str]:
+    return [area.name for area in instance.research_areas]
+
+def parse_fields(fields: Optional[str], model) -> Optional[List[str]]:
+    if fields is None:
+        return None
+    requested = list(dict.fromkeys(f.strip() for f in fields.split(',') if f.strip()))
+    unknown = [f for f in requested if f not in crud.FIELD_SPECS[model]]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested or None
+
+def format_fields(instance, fields: List[str], derived: dict) -> dict:
+    return {
+        field: derived[field](instance) if field in derived else getattr(instance, field)
+        for field in fields
+    }
+
+def sparse_response(content, response: Optional[Response] = None) -> JSONResponse:
+    """Sparse fieldsets skip response_model validation, which requires every field"""
+    headers = dict(response.headers) if response is not None else None
+    return JSONResponse(content=jsonable_encoder(content), headers=headers)
+
+def parse_ids(ids: str) -> List[int]:
+    try:
+        parsed = [int(i) for i in ids.split(',') if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    if len(parsed) > MAX_MULTI_GET_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_MULTI_GET_IDS} ids per request")
+    return list(dict.fromkeys(parsed))
+
+def in_requested_order(rows, requested_ids: List[int], id_attr: str, response: Response):
+    """Order multi-get rows like the request and report missing IDs in X-Missing-IDs"""
+    by_id = {row[id_attr] if isinstance(row, dict) else getattr(row, id_attr): row for row in rows}
+    missing = [i for i in requested_ids if i not in by_id]
+    if missing:
+        response.headers["X-Missing-IDs"] = ",".join(str(i) for i in missing)
+    return [by_id[i] for i in requested_ids if i in by_id]
+
+
 # Professors 
-@app.get("/professors/", response_model=List[schemas.ProfessorResponse])
-def read_professors(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    professors = crud.get_all_professors(db, skip=skip, limit=limit)
-    return [format_professor_response(p) for p in professors]
-
-@app.get("/professors/{professor_id}", response_model=schemas.ProfessorResponse)
-def read_professor(professor_id: int, db: Session = Depends(get_db)):
-    db_professor = crud.get_professor(db, professor_id=professor_id)
+@router.get("/professors/", response_model=List[schemas.ProfessorResponse])
+def read_professors(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    ids: Optional[str] = None,
+    include_total: bool = False,
+    fields: Optional[str] = None,
+    updated_since: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    requested_fields = parse_fields(fields, models.Professor)
+    if ids is not None:
+        requested = parse_ids(ids)
+        if requested_fields:
+            rows = crud.get_professors_by_ids(db, requested, fields=requested_fields)
+        else:
+            rows = read_models.get_professors_by_ids(db, requested)
+        professors = in_requested_order(rows, requested, 'professor_id', response)
+        if include_total:
+            set_total_count(response, len(professors), True)
+    else:
+        if updated_since is not None:
+            set_sync_headers(response, db, models.Professor, updated_since)
+        if requested_fields:
+            professors = crud.get_all_professors(
+                db, skip=skip, limit=limit, fields=requested_fields, updated_since=updated_since
+            )
+        else:
+            professors = read_models.get_all_professors(db, skip=skip, limit=limit, updated_since=updated_since)
+        if include_total:
+            set_total_count(
+                response, *crud.count_rows(db, models.Professor, crud.sync_filters(models.Professor, updated_since))
+            )
+    if requested_fields:
+        return sparse_response(
+            [format_fields(p, requested_fields, PROFESSOR_DERIVED_FIELDS) for p in professors], response
+        )
+    return professors
+
+@router.get("/professors/{professor_id}", response_model=schemas.ProfessorResponse)
+def read_professor(professor_id: int, response: Response, fields: Optional[str] = None, db: Session = Depends(get_db)):
+    requested_fields = parse_fields(fields, models.Professor)
+    if requested_fields:
+        db_professor = crud.get_professor(db, professor_id=professor_id, fields=requested_fields)
+    else:
+        db_professor = read_models.get_professor(db, professor_id)
     if not db_professor:
         raise HTTPException(status_code=404, detail="Professor not found")
-    return format_professor_response(db_professor)
+    set_etag(response, db_professor)
+    if requested_fields:
+        return sparse_response(format_fields(db_professor, requested_fields, PROFESSOR_DERIVED_FIELDS), response)
+    return db_professor
 
 def format_professor_response(professor: models.Professor):
     return schemas.ProfessorResponse(
-        **professor.__dict__,
-        department=professor.department.name if professor.department else None,
-        research_areas=[area.name for area in professor.research_areas]
+        **column_values(professor),
+        department=department_name(professor),
+        research_areas=research_area_names(professor)
     )
 
-@app.post("/professors/", response_model=schemas.ProfessorResponse)
+PROFESSOR_DERIVED_FIELDS = {
+    'department': department_name,
+    'research_areas': research_area_names,
+}
+
+@router.post("/professors/", response_model=schemas.ProfessorResponse)
 def create_professor_endpoint(professor: ProfessorCreate, db: Session = Depends(get_db)):
     existing_professor = db.query(models.Professor).filter(
         models.Professor.email == professor.email
@@ -201,91 +422,145 @@ def create_professor_endpoint(professor: ProfessorCreate, db: Session = Depends(
     if existing_professor:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    if professor.department_id:
-        department = db.query(models.Department).filter(
-            models.Department.department_id == professor.department_id
-        ).first()
-        if not department:
-            raise HTTPException(status_code=400, detail="Invalid department ID")
+    if professor.department_id and not reference_cache.has_department(db, professor.department_id):
+        raise HTTPException(status_code=400, detail="Invalid department ID")
 
     try:
         professor_data = professor.dict(exclude={'research_areas'})
-        db_professor = crud.create_professor(db, professor_data)
-        
-        if professor.research_areas:
-            research_areas = (
-                db.query(models.ResearchArea)
-                .filter(models.ResearchArea.area_id.in_(professor.research_areas))
-                .all()
-            )
-            db_professor.research_areas = research_areas
-            db.commit()
-            
+        db_professor = crud.create_professor(db, professor_data, professor.research_areas)
+
+        advisor_matcher.refresh_professor(db, db_professor.professor_id)
+        directory_index.refresh_professor(db, db_professor.professor_id)
         return format_professor_response(db_professor)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.put("/professors/{professor_id}", response_model=schemas.ProfessorResponse)
+@router.put("/professors/{professor_id}", response_model=schemas.ProfessorResponse)
 def update_professor_endpoint(
     professor_id: int,
     professor: ProfessorUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     db_professor = crud.get_professor(db, professor_id)
     if not db_professor:
         raise HTTPException(status_code=404, detail="Professor not found")
     
-    updated_professor = crud.update_professor(db, professor_id, professor.dict(exclude_unset=True))
+    updated_professor = versioned_update(crud.update_professor, db, professor_id, professor, if_match)
+    if not updated_professor:
+        # Deleted between the check above and the update
+        raise HTTPException(status_code=404, detail="Professor not found")
+    set_etag(response, updated_professor)
+    advisor_matcher.refresh_professor(db, professor_id)
+    directory_index.refresh_professor(db, professor_id)
     return format_professor_response(updated_professor)
 
-@app.delete("/professors/{professor_id}")
+@router.delete("/professors/{professor_id}")
 def delete_professor_endpoint(professor_id: int, db: Session = Depends(get_db)):
-    if not crud.delete_professor(db, professor_id):
+    if not versioned_delete(crud.delete_professor, db, professor_id):
         raise HTTPException(status_code=404, detail="Professor not found")
+    advisor_matcher.remove_professor(professor_id)
+    directory_index.remove_professor(professor_id)
     return {"message": "Professor deleted successfully"}
 
 
 # Students 
-@app.get("/students/", response_model=List[schemas.GradStudentResponse])
-def read_students(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    students = crud.get_all_students(db, skip=skip, limit=limit)
-    return [format_student_response(s) for s in students]
-
-@app.get("/students/{student_id}", response_model=schemas.GradStudentResponse)
-def read_student(student_id: int, db: Session = Depends(get_db)):
-    db_student = crud.get_student(db, student_id=student_id)
+@router.get("/students/", response_model=List[schemas.GradStudentResponse])
+def read_students(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    ids: Optional[str] = None,
+    include_total: bool = False,
+    fields: Optional[str] = None,
+    updated_since: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    requested_fields = parse_fields(fields, models.GradStudent)
+    if ids is not None:
+        requested = parse_ids(ids)
+        if requested_fields:
+            rows = crud.get_students_by_ids(db, requested, fields=requested_fields)
+        else:
+            rows = read_models.get_students_by_ids(db, requested)
+        students = in_requested_order(rows, requested, 'student_id', response)
+        if include_total:
+            set_total_count(response, len(students), True)
+    else:
+        if updated_since is not None:
+            set_sync_headers(response, db, models.GradStudent, updated_since)
+        if requested_fields:
+            students = crud.get_all_students(
+                db, skip=skip, limit=limit, fields=requested_fields, updated_since=updated_since
+            )
+        else:
+            students = read_models.get_all_students(db, skip=skip, limit=limit, updated_since=updated_since)
+        if include_total:
+            set_total_count(
+                response, *crud.count_rows(db, models.GradStudent, crud.sync_filters(models.GradStudent, updated_since))
+            )
+    if requested_fields:
+        return sparse_response(
+            [format_fields(s, requested_fields, STUDENT_DERIVED_FIELDS) for s in students], response
+        )
+    return students
+
+@router.get("/students/{student_id}", response_model=schemas.GradStudentResponse)
+def read_student(student_id: int, response: Response, fields: Optional[str] = None, db: Session = Depends(get_db)):
+    requested_fields = parse_fields(fields, models.GradStudent)
+    if requested_fields:
+        db_student = crud.get_student(db, student_id=student_id, fields=requested_fields)
+    else:
+        db_student = read_models.get_student(db, student_id)
     if not db_student:
         raise HTTPException(status_code=404, detail="Student not found")
-    return format_student_response(db_student)
+    set_etag(response, db_student)
+    if requested_fields:
+        return sparse_response(format_fields(db_student, requested_fields, STUDENT_DERIVED_FIELDS), response)
+    return db_student
 
 def format_student_response(student: models.GradStudent):
     return schemas.GradStudentResponse(
-        **student.__dict__,
-        advisor=f"{student.advisor.first_name} {student.advisor.last_name}" if student.advisor else None,
-        department=student.department.name if student.department else None,
-        research_areas=[area.name for area in student.research_areas]
+        **column_values(student),
+        advisor=person_name(student.advisor),
+        department=department_name(student),
+        research_areas=research_area_names(student)
     )
 
-@app.put("/students/{student_id}", response_model=schemas.GradStudentResponse)
+STUDENT_DERIVED_FIELDS = {
+    'advisor': lambda student: person_name(student.advisor),
+    'department': department_name,
+    'research_areas': research_area_names,
+}
+
+@router.put("/students/{student_id}", response_model=schemas.GradStudentResponse)
 def update_student_details(
     student_id: int,
     student: StudentUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """Update student details"""
-    db_student = crud.update_student(db, student_id, student.dict(exclude_unset=True))
+    db_student = versioned_update(crud.update_student, db, student_id, student, if_match)
     if not db_student:
         raise HTTPException(status_code=404, detail="Student not found")
+    set_etag(response, db_student)
+    advisor_matcher.refresh_student(db, student_id)
+    directory_index.refresh_student(db, student_id)
     return format_student_response(db_student)
 
-@app.delete("/students/{student_id}")
+@router.delete("/students/{student_id}")
 def delete_student_record(student_id: int, db: Session = Depends(get_db)):
-    success = crud.delete_student(db, student_id)
+    success = versioned_delete(crud.delete_student, db, student_id)
     if not success:
         raise HTTPException(status_code=404, detail="Student not found")
+    advisor_matcher.remove_student(student_id)
+    directory_index.remove_student(student_id)
     return {"message": "Student deleted successfully"}
 
-@app.post("/students/", response_model=schemas.GradStudentResponse)
+@router.post("/students/", response_model=schemas.GradStudentResponse)
 def create_student_endpoint(
     student: StudentCreate,
     db: Session = Depends(get_db)
@@ -311,29 +586,18 @@ def create_student_endpoint(
                 detail="Invalid advisor ID"
             )
     
-    if student.department_id:
-        department = db.query(models.Department).filter(
-            models.Department.department_id == student.department_id
-        ).first()
-        if not department:
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid department ID"
-            )
+    if student.department_id and not reference_cache.has_department(db, student.department_id):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid department ID"
+        )
 
     try:
         student_data = student.dict(exclude={'research_areas'})
-        db_student = crud.create_student(db, student_data)
-        
-        if student.research_areas:
-            research_areas = (
-                db.query(models.ResearchArea)
-                .filter(models.ResearchArea.area_id.in_(student.research_areas))
-                .all()
-            )
-            db_student.research_areas = research_areas
-            db.commit()
-            
+        db_student = crud.create_student(db, student_data, student.research_areas)
+
+        advisor_matcher.refresh_student(db, db_student.student_id)
+        directory_index.refresh_student(db, db_student.student_id)
         return format_student_response(db_student)
     except Exception as e:
         raise HTTPException(
@@ -342,42 +606,89 @@ def create_student_endpoint(
         )
 
 # Projects 
-@app.get("/projects/", response_model=List[schemas.ProjectResponse])
-def read_projects(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    projects = crud.get_all_projects(db, skip=skip, limit=limit)
-    return [format_project_response(p) for p in projects]
-
-@app.get("/projects/{project_id}", response_model=schemas.ProjectResponse)
-def read_project(project_id: int, db: Session = Depends(get_db)):
-    db_project = crud.get_project(db, project_id=project_id)
+@router.get("/projects/", response_model=List[schemas.ProjectResponse])
+def read_projects(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    ids: Optional[str] = None,
+    include_total: bool = False,
+    fields: Optional[str] = None,
+    updated_since: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    requested_fields = parse_fields(fields, models.Project)
+    if ids is not None:
+        requested = parse_ids(ids)
+        if requested_fields:
+            rows = crud.get_projects_by_ids(db, requested, fields=requested_fields)
+        else:
+            rows = read_models.get_projects_by_ids(db, requested)
+        projects = in_requested_order(rows, requested, 'project_id', response)
+        if include_total:
+            set_total_count(response, len(projects), True)
+    else:
+        if updated_since is not None:
+            set_sync_headers(response, db, models.Project, updated_since)
+        if requested_fields:
+            projects = crud.get_all_projects(
+                db, skip=skip, limit=limit, fields=requested_fields, updated_since=updated_since
+            )
+        else:
+            projects = read_models.get_all_projects(db, skip=skip, limit=limit, updated_since=updated_since)
+        if include_total:
+            set_total_count(
+                response, *crud.count_rows(db, models.Project, crud.sync_filters(models.Project, updated_since))
+            )
+    if requested_fields:
+        return sparse_response(
+            [format_fields(p, requested_fields, PROJECT_DERIVED_FIELDS) for p in projects], response
+        )
+    return projects
+
+@router.get("/projects/{project_id}", response_model=schemas.ProjectResponse)
+def read_project(project_id: int, response: Response, fields: Optional[str] = None, db: Session = Depends(get_db)):
+    requested_fields = parse_fields(fields, models.Project)
+    if requested_fields:
+        db_project = crud.get_project(db, project_id=project_id, fields=requested_fields)
+    else:
+        db_project = read_models.get_project(db, project_id)
     if not db_project:
         raise HTTPException(status_code=404, detail="Project not found")
-    return format_project_response(db_project)
+    set_etag(response, db_project)
+    if requested_fields:
+        return sparse_response(format_fields(db_project, requested_fields, PROJECT_DERIVED_FIELDS), response)
+    return db_project
 
-def format_project_response(project: models.Project):
-    professors = [
-        schemas.Participant(
-            name=f"{assoc.professor.first_name} {assoc.professor.last_name}",
-            role=assoc.role
-        )
+def project_professors(project: models.Project) -> List[schemas.Participant]:
+    return [
+        schemas.Participant(name=person_name(assoc.professor), role=assoc.role)
         for assoc in project.professor_associations
     ]
-    students = [
-        schemas.Participant(
-            name=f"{assoc.student.first_name} {assoc.student.last_name}",
-            role=assoc.role
-        )
+
+def project_students(project: models.Project) -> List[schemas.Participant]:
+    return [
+        schemas.Participant(name=person_name(assoc.student), role=assoc.role)
         for assoc in project.student_associations
     ]
+
+def format_project_response(project: models.Project):
     return schemas.ProjectResponse(
-        **project.__dict__,
-        lead_professor=f"{project.lead_professor.first_name} {project.lead_professor.last_name}" if project.lead_professor else None,
-        department=project.department.name if project.department else None,
-        professors=professors,
-        students=students
+        **column_values(project),
+        lead_professor=person_name(project.lead_professor),
+        department=department_name(project),
+        professors=project_professors(project),
+        students=project_students(project)
     )
 
-@app.post("/projects/", response_model=schemas.ProjectResponse)
+PROJECT_DERIVED_FIELDS = {
+    'lead_professor': lambda project: person_name(project.lead_professor),
+    'department': department_name,
+    'professors': project_professors,
+    'students': project_students,
+}
+
+@router.post("/projects/", response_model=schemas.ProjectResponse)
 def create_project_endpoint(project: ProjectCreate, db: Session = Depends(get_db)):
     lead_professor = db.query(models.Professor).filter(
         models.Professor.professor_id == project.lead_professor_id
@@ -385,10 +696,7 @@ def create_project_endpoint(project: ProjectCreate, db: Session = Depends(get_db
     if not lead_professor:
         raise HTTPException(status_code=400, detail="Invalid lead professor ID")
     
-    department = db.query(models.Department).filter(
-        models.Department.department_id == project.department_id
-    ).first()
-    if not department:
+    if not reference_cache.has_department(db, project.department_id):
         raise HTTPException(status_code=400, detail="Invalid department ID")
 
     try:
@@ -397,40 +705,131 @@ def create_project_endpoint(project: ProjectCreate, db: Session = Depends(get_db
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.put("/projects/{project_id}", response_model=schemas.ProjectResponse)
+@router.put("/projects/{project_id}", response_model=schemas.ProjectResponse)
 def update_project_endpoint(
     project_id: int,
     project: ProjectUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     db_project = crud.get_project(db, project_id)
     if not db_project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    updated_project = crud.update_project(db, project_id, project.dict(exclude_unset=True))
+    updated_project = versioned_update(crud.update_project, db, project_id, project, if_match)
+    if not updated_project:
+        # Deleted between the check above and the update
+        raise HTTPException(status_code=404, detail="Project not found")
+    set_etag(response, updated_project)
     return format_project_response(updated_project)
 
-@app.delete("/projects/{project_id}")
+def check_people_exist(db: Session, professor_ids: List[int], student_ids: List[int]):
+    missing_professors = crud.get_missing_ids(db, models.Professor, professor_ids)
+    missing_students = crud.get_missing_ids(db, models.GradStudent, student_ids)
+    if missing_professors or missing_students:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown professor IDs: {missing_professors}, unknown student IDs: {missing_students}"
+        )
+
+@router.put("/projects/{project_id}/team", response_model=schemas.ProjectResponse)
+def set_project_team_endpoint(
+    project_id: int,
+    team: schemas.ProjectTeamUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Replace the project's professors and students; only rows that differ are written"""
+    if not crud.get_project(db, project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+    professor_ids = [member.id for member in team.professors]
+    student_ids = [member.id for member in team.students]
+    if len(set(professor_ids)) != len(professor_ids) or len(set(student_ids)) != len(student_ids):
+        raise HTTPException(status_code=400, detail="A person can only be on the team once")
+    check_people_exist(db, professor_ids, student_ids)
+
+    version = expected_version(if_match, team.version)
+    try:
+        changed = crud.set_project_team(
+            db, project_id,
+            [(member.id, member.role) for member in team.professors],
+            [(member.id, member.role) for member in team.students],
+            expected_version=version
+        )
+    except crud.VersionConflict as e:
+        raise version_conflict(e)
+    db_project = crud.get_project(db, project_id) if changed is not None else None
+    if not db_project:
+        # Deleted between the check above and the update
+        raise HTTPException(status_code=404, detail="Project not found")
+    set_etag(response, db_project)
+    return format_project_response(db_project)
+
+@router.delete("/projects/{project_id}")
 def delete_project_endpoint(project_id: int, db: Session = Depends(get_db)):
-    if not crud.delete_project(db, project_id):
+    if not versioned_delete(crud.delete_project, db, project_id):
         raise HTTPException(status_code=404, detail="Project not found")
     return {"message": "Project deleted successfully"}
 
 
 # Publications 
-@app.get("/publications/", response_model=List[schemas.PublicationResponse])
-def read_publications(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    publications = crud.get_all_publications(db, skip=skip, limit=limit)
-    return [format_publication_response(p) for p in publications]
-
-@app.get("/publications/{publication_id}", response_model=schemas.PublicationResponse)
-def read_publication(publication_id: int, db: Session = Depends(get_db)):
-    db_publication = crud.get_publication(db, publication_id=publication_id)
+@router.get("/publications/", response_model=List[schemas.PublicationResponse])
+def read_publications(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    ids: Optional[str] = None,
+    include_total: bool = False,
+    fields: Optional[str] = None,
+    updated_since: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    requested_fields = parse_fields(fields, models.Publication)
+    if ids is not None:
+        requested = parse_ids(ids)
+        if requested_fields:
+            rows = crud.get_publications_by_ids(db, requested, fields=requested_fields)
+        else:
+            rows = read_models.get_publications_by_ids(db, requested)
+        publications = in_requested_order(rows, requested, 'publication_id', response)
+        if include_total:
+            set_total_count(response, len(publications), True)
+    else:
+        if updated_since is not None:
+            set_sync_headers(response, db, models.Publication, updated_since)
+        if requested_fields:
+            publications = crud.get_all_publications(
+                db, skip=skip, limit=limit, fields=requested_fields, updated_since=updated_since
+            )
+        else:
+            publications = read_models.get_all_publications(db, skip=skip, limit=limit, updated_since=updated_since)
+        if include_total:
+            set_total_count(
+                response, *crud.count_rows(db, models.Publication, crud.sync_filters(models.Publication, updated_since))
+            )
+    if requested_fields:
+        return sparse_response(
+            [format_fields(p, requested_fields, PUBLICATION_DERIVED_FIELDS) for p in publications], response
+        )
+    return publications
+
+@router.get("/publications/{publication_id}", response_model=schemas.PublicationResponse)
+def read_publication(publication_id: int, response: Response, fields: Optional[str] = None, db: Session = Depends(get_db)):
+    requested_fields = parse_fields(fields, models.Publication)
+    if requested_fields:
+        db_publication = crud.get_publication(db, publication_id=publication_id, fields=requested_fields)
+    else:
+        db_publication = read_models.get_publication(db, publication_id)
     if not db_publication:
         raise HTTPException(status_code=404, detail="Publication not found")
-    return format_publication_response(db_publication)
+    set_etag(response, db_publication)
+    if requested_fields:
+        return sparse_response(format_fields(db_publication, requested_fields, PUBLICATION_DERIVED_FIELDS), response)
+    return db_publication
 
-def format_publication_response(publication: models.Publication):
+def publication_authors(publication: models.Publication) -> List[schemas.Author]:
     authors = []
     for pa in publication.professor_authors:
         authors.append(schemas.Author(
@@ -444,25 +843,29 @@ def format_publication_response(publication: models.Publication):
             type="student",
             order=sa.author_order
         ))
-    authors_sorted = sorted(authors, key=lambda x: x.order)
+    return sorted(authors, key=lambda x: x.order)
+
+def format_publication_response(publication: models.Publication):
     return schemas.PublicationResponse(
-        **publication.__dict__,
-        journal=publication.journal.name if publication.journal else None,
-        authors=authors_sorted
+        **column_values(publication),
+        journal=journal_name(publication),
+        authors=publication_authors(publication)
     )
 
-@app.delete("/publications/{publication_id}")
+PUBLICATION_DERIVED_FIELDS = {
+    'journal': journal_name,
+    'authors': publication_authors,
+}
+
+@router.delete("/publications/{publication_id}")
 def delete_publication_endpoint(publication_id: int, db: Session = Depends(get_db)):
-    if not crud.delete_publication(db, publication_id):
+    if not versioned_delete(crud.delete_publication, db, publication_id):
         raise HTTPException(status_code=404, detail="Publication not found")
     return {"message": "Publication deleted successfully"}
 
-@app.post("/publications/", response_model=schemas.PublicationResponse)
+@router.post("/publications/", response_model=schemas.PublicationResponse)
 def create_publication_endpoint(publication: PublicationCreate, db: Session = Depends(get_db)):
-    journal = db.query(models.Journal).filter(
-        models.Journal.journal_id == publication.journal_id
-    ).first()
-    if not journal:
+    if not reference_cache.has_journal(db, publication.journal_id):
         raise HTTPException(status_code=400, detail="Invalid journal ID")
 
     try:
@@ -471,22 +874,260 @@ def create_publication_endpoint(publication: PublicationCreate, db: Session = De
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.put("/publications/{publication_id}", response_model=schemas.PublicationResponse)
+@router.put("/publications/{publication_id}", response_model=schemas.PublicationResponse)
 def update_publication_endpoint(
     publication_id: int,
     publication: PublicationUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     db_publication = crud.get_publication(db, publication_id)
     if not db_publication:
         raise HTTPException(status_code=404, detail="Publication not found")
     
-    updated_publication = crud.update_publication(db, publication_id, publication.dict(exclude_unset=True))
+    updated_publication = versioned_update(crud.update_publication, db, publication_id, publication, if_match)
+    if not updated_publication:
+        # Deleted between the check above and the update
+        raise HTTPException(status_code=404, detail="Publication not found")
+    set_etag(response, updated_publication)
     return format_publication_response(updated_publication)
 
+@router.put("/publications/{publication_id}/authors", response_model=schemas.PublicationResponse)
+def set_publication_authors_endpoint(
+    publication_id: int,
+    body: schemas.PublicationAuthorsUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Replace the author list, in order; only rows that differ are written"""
+    if not crud.get_publication(db, publication_id):
+        raise HTTPException(status_code=404, detail="Publication not found")
+    if any(author.type not in ('professor', 'student') for author in body.authors):
+        raise HTTPException(status_code=400, detail="Invalid author type, expected 'professor' or 'student'")
+    authors = [(author.type, author.id) for author in body.authors]
+    if len(set(authors)) != len(authors):
+        raise HTTPException(status_code=400, detail="An author can only appear once")
+    check_people_exist(
+        db,
+        [author_id for kind, author_id in authors if kind == 'professor'],
+        [author_id for kind, author_id in authors if kind == 'student']
+    )
+
+    version = expected_version(if_match, body.version)
+    try:
+        changed = crud.set_publication_authors(db, publication_id, authors, expected_version=version)
+    except crud.VersionConflict as e:
+        raise version_conflict(e)
+    db_publication = crud.get_publication(db, publication_id) if changed is not None else None
+    if not db_publication:
+        # Deleted between the check above and the update
+        raise HTTPException(status_code=404, detail="Publication not found")
+    set_etag(response, db_publication)
+    return format_publication_response(db_publication)
+
+
+# Citation metrics
+def format_citation_metrics(entity_id: int, metrics, top_publications):
+    return schemas.CitationMetricsResponse(
+        entity_id=entity_id,
+        h_index=metrics.h_index if metrics else 0,
+        i10_index=metrics.i10_index if metrics else 0,
+        total_citations=metrics.total_citations if metrics else 0,
+        publication_count=metrics.publication_count if metrics else 0,
+        top_publications=[
+            schemas.TopPublication(
+                rank=top.rank,
+                publication_id=top.publication_id,
+                title=title,
+                citations=top.citations
+            )
+            for top, title in top_publications
+        ]
+    )
+
+def read_citation_leaderboard(db: Session, scope: str, metric: str, limit: int):
+    if metric not in crud.CITATION_METRICS:
+        raise HTTPException(status_code=400, detail=f"Invalid metric, expected one of {', '.join(crud.CITATION_METRICS)}")
+    results = crud.get_citation_leaderboard(db, scope, metric=metric, limit=limit)
+    return [
+        schemas.LeaderboardEntry(
+            entity_id=metrics.entity_id,
+            name=name,
+            h_index=metrics.h_index,
+            i10_index=metrics.i10_index,
+            total_citations=metrics.total_citations,
+            publication_count=metrics.publication_count
+        )
+        for metrics, name in results
+    ]
+
+@router.get("/professors/{professor_id}/citation-metrics", response_model=schemas.CitationMetricsResponse)
+def read_professor_citation_metrics(professor_id: int, db: Session = Depends(get_db)):
+    if not crud.get_professor(db, professor_id):
+        raise HTTPException(status_code=404, detail="Professor not found")
+    metrics, top_publications = crud.get_citation_metrics(db, 'professor', professor_id)
+    return format_citation_metrics(professor_id, metrics, top_publications)
+
+@router.get("/departments/{department_id}/citation-metrics", response_model=schemas.CitationMetricsResponse)
+def read_department_citation_metrics(department_id: int, db: Session = Depends(get_db)):
+    metrics, top_publications = crud.get_citation_metrics(db, 'department', department_id)
+    return format_citation_metrics(department_id, metrics, top_publications)
+
+@router.get("/analytics/leaderboards/professors/", response_model=List[schemas.LeaderboardEntry])
+def get_professor_leaderboard(metric: str = 'h_index', limit: int = 10, db: Session = Depends(get_db)):
+    return read_citation_leaderboard(db, 'professor', metric, limit)
+
+@router.get("/analytics/leaderboards/departments/", response_model=List[schemas.LeaderboardEntry])
+def get_department_leaderboard(metric: str = 'h_index', limit: int = 10, db: Session = Depends(get_db)):
+    return read_citation_leaderboard(db, 'department', metric, limit)
+
+@router.post("/internal/changes/prune", response_model=schemas.ChangePruneResponse)
+def prune_changes_endpoint(request: Request, db: Session = Depends(get_db)):
+    """Delete change events older than CHANGE_RETENTION_DAYS; run it periodically, e.g. daily from cron"""
+    pruned_before = datetime.now(timezone.utc) - timedelta(days=request.app.state.settings.change_retention_days)
+    deleted = crud.prune_changes(db, pruned_before)
+    return schemas.ChangePruneResponse(deleted=deleted, pruned_before=pruned_before)
+
+@router.post("/analytics/citation-metrics/refresh")
+def refresh_citation_metrics_endpoint(db: Session = Depends(get_db)):
+    """Rebuild all citation metrics, e.g. after a bulk import"""
+    crud.refresh_citation_metrics(db)
+    db.commit()
+    return {"message": "Citation metrics refreshed"}
+
+
+# Change feed
+CHANGE_STREAM_POLL_INTERVAL = 1.0
+CHANGE_STREAM_HEARTBEAT = 15.0
+
+def format_change_event(event: models.ChangeEvent):
+    return schemas.ChangeEventResponse(
+        seq=event.seq,
+        entity=event.entity,
+        entity_id=event.entity_id,
+        op=event.op,
+        data=event.data,
+        created_at=event.created_at
+    )
+
+def fetch_changes(since: int, limit: int) -> List[schemas.ChangeEventResponse]:
+    db = SessionLocal()
+    try:
+        return [format_change_event(e) for e in crud.get_changes(db, since=since, limit=limit)]
+    finally:
+        db.close()
+
+def check_change_history(db: Session, since: int):
+    pruned_through = crud.get_pruned_through_seq(db)
+    if since < pruned_through:
+        raise HTTPException(
+            status_code=410,
+            detail=f"Events up to seq {pruned_through} have been pruned; reload in full, then follow from since={pruned_through}"
+        )
+
+def check_change_history_in_thread(since: int):
+    db = SessionLocal()
+    try:
+        check_change_history(db, since)
+    finally:
+        db.close()
+
+@router.get("/changes", response_model=schemas.ChangePage)
+def read_changes(since: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    """Outbox events after `since`; pass `next` back as `since` for the following page"""
+    check_change_history(db, since)
+    limit = max(1, min(limit, 1000))
+    events = [format_change_event(e) for e in crud.get_changes(db, since=since, limit=limit)]
+    return schemas.ChangePage(
+        events=events,
+        next=events[-1].seq if events else since,
+        has_more=len(events) == limit
+    )
+
+@router.get("/changes/stream")
+async def stream_changes(request: Request, since: Optional[int] = None):
+    """Server-sent events for new outbox rows, resumable through Last-Event-ID"""
+    if since is None:
+        try:
+            since = int(request.headers.get("last-event-id", "").strip() or 0)
+        except ValueError:
+            since = -1
+        if since < 0:
+            raise HTTPException(status_code=400, detail="Last-Event-ID must be a seq sent by this stream")
+    await run_in_threadpool(check_change_history_in_thread, since)
+
+    async def events():
+        cursor = since
+        idle = 0.0
+        while not await request.is_disconnected():
+            batch = await run_in_threadpool(fetch_changes, cursor, 100)
+            for event in batch:
+                cursor = event.seq
+                yield f"id: {event.seq}\nevent: change\ndata: {event.json()}\n\n"
+            if batch:
+                idle = 0.0
+                continue
+            await asyncio.sleep(CHANGE_STREAM_POLL_INTERVAL)
+            idle += CHANGE_STREAM_POLL_INTERVAL
+            if idle >= CHANGE_STREAM_HEARTBEAT:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# Matching
+@router.get("/matching/students/{student_id}/advisors", response_model=List[schemas.AdvisorMatch])
+def match_advisors_for_student(
+    student_id: int,
+    k: int = 5,
+    metric: str = 'jaccard',
+    same_department: bool = True,
+    max_load: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    try:
+        matches = advisor_matcher.match_students(
+            db, [student_id], k=k, metric=metric,
+            same_department=same_department, max_load=max_load
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if student_id not in matches:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return matches[student_id]
+
+@router.get("/matching/unassigned-students/", response_model=List[schemas.StudentAdvisorMatches])
+def match_advisors_for_unassigned_students(
+    k: int = 5,
+    metric: str = 'jaccard',
+    same_department: bool = True,
+    max_load: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Top-k advisor matches for every student without an advisor"""
+    student_ids = advisor_matcher.unassigned_student_ids(db)
+    try:
+        matches = advisor_matcher.match_students(
+            db, student_ids, k=k, metric=metric,
+            same_department=same_department, max_load=max_load
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return [
+        schemas.StudentAdvisorMatches(student_id=student_id, matches=matches.get(student_id, []))
+        for student_id in student_ids
+    ]
+
 
 # Mixed 
-@app.get("/analytics/department-funding/", response_model=List[DepartmentFunding])
+@router.get("/analytics/department-funding/", response_model=List[DepartmentFunding])
 def get_department_funding(db: Session = Depends(get_db)):
     results = crud.get_department_avg_funding(db)
     return [
@@ -494,7 +1135,7 @@ def get_department_funding(db: Session = Depends(get_db)):
         for dept, avg in results
     ]
 
-@app.get("/analytics/departments-above-average/", response_model=List[DepartmentFunding])
+@router.get("/analytics/departments-above-average/", response_model=List[DepartmentFunding])
 def get_departments_above_average(db: Session = Depends(get_db)):
     results = crud.get_departments_above_avg_funding(db)
     return [
@@ -502,14 +1143,20 @@ def get_departments_above_average(db: Session = Depends(get_db)):
         for dept, total in results
     ]
 
-@app.get("/analytics/average-publications/", response_model=AveragePublications)
+@router.get("/analytics/average-publications/", response_model=AveragePublications)
 def get_average_publications(db: Session = Depends(get_db)):
     avg = crud.get_avg_publications_per_professor(db)
     return AveragePublications(average=avg)
 
-@app.get("/analytics/inactive-professors/", response_model=List[InactiveProfessor])
-def get_inactive_professors_endpoint(db: Session = Depends(get_db)):
-    results = crud.get_inactive_professors(db)
+MAX_ANALYTICS_PAGE = 1000
+
+def analytics_page_size(limit: int) -> int:
+    return max(1, min(limit, MAX_ANALYTICS_PAGE))
+
+@router.get("/analytics/inactive-professors/", response_model=List[InactiveProfessor])
+def get_inactive_professors_endpoint(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    """Professors leading no active project, a page at a time in ID order"""
+    results = crud.get_inactive_professors(db, skip=max(skip, 0), limit=analytics_page_size(limit))
     return [
         InactiveProfessor(
             professor_id=prof.professor_id,
@@ -517,13 +1164,13 @@ def get_inactive_professors_endpoint(db: Session = Depends(get_db)):
             last_name=prof.last_name,
             email=prof.email,
             title=prof.title,
-            department=prof.department.name if prof.department else None,
+            department=department_name(prof),
             research_areas=[area.name for area in prof.research_areas]
         )
         for prof in results
     ]
 
-@app.get("/analytics/small-departments/", response_model=List[DepartmentCount])
+@router.get("/analytics/small-departments/", response_model=List[DepartmentCount])
 def get_small_departments_endpoint(db: Session = Depends(get_db)):
     """Get departments with less than 3 professors"""
     results = crud.get_small_departments(db)
@@ -532,7 +1179,7 @@ def get_small_departments_endpoint(db: Session = Depends(get_db)):
         for dept, count in results
     ]
 
-@app.get("/directory/emails/", response_model=List[EmailEntry])
+@router.get("/directory/emails/", response_model=List[EmailEntry])
 def get_all_emails_endpoint(db: Session = Depends(get_db)):
     results = crud.get_all_emails(db)
     return [
@@ -540,9 +1187,45 @@ def get_all_emails_endpoint(db: Session = Depends(get_db)):
         for name, email in results
     ]
 
-@app.get("/analytics/unassigned-students/", response_model=List[UnassignedStudent])
-def get_unassigned_students(db: Session = Depends(get_db)):
-    results = crud.get_students_without_projects(db)
+MAX_SEARCH_RESULTS = 50
+
+@router.get("/directory/search", response_model=List[schemas.DirectorySearchResult])
+def search_directory(
+    q: str,
+    limit: int = 10,
+    type: Optional[str] = None,
+    fuzzy: bool = True,
+    db: Session = Depends(get_db)
+):
+    """Typeahead over names and emails: in-memory prefix matches, topped up with trigram matches"""
+    if type is not None and type not in ('professor', 'student'):
+        raise HTTPException(status_code=400, detail="Invalid type, expected 'professor' or 'student'")
+    limit = max(1, min(limit, MAX_SEARCH_RESULTS))
+    directory_index.ensure_loaded(db)
+    results = directory_index.search(q, limit=limit, kind=type)
+    # Misspellings and mid-word matches don't prefix-match; ask pg_trgm for the rest
+    if fuzzy and len(results) < limit and len(q.strip()) >= 3:
+        seen = {(r['type'], r['id']) for r in results}
+        for kind, entity_id, first_name, last_name, email, score in crud.search_people_fuzzy(
+            db, q.strip(), limit=limit + len(seen)
+        ):
+            if (kind, entity_id) in seen or (type is not None and kind != type):
+                continue
+            results.append({
+                'type': kind,
+                'id': entity_id,
+                'name': f"{first_name} {last_name}",
+                'email': email,
+                'score': round(float(score), 4)
+            })
+            if len(results) >= limit:
+                break
+    return results
+
+@router.get("/analytics/unassigned-students/", response_model=List[UnassignedStudent])
+def get_unassigned_students(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    """Students with no advisor and no project, a page at a time in ID order"""
+    results = crud.get_students_without_projects(db, skip=max(skip, 0), limit=analytics_page_size(limit))
     return [
         UnassignedStudent(
             student_id=student.student_id,
@@ -551,17 +1234,108 @@ def get_unassigned_students(db: Session = Depends(get_db)):
             email=student.email,
             enrollment_date=student.enrollment_date,
             type=student.type,
-            department=student.department.name if student.department else None,
+            department=department_name(student),
             research_areas=[area.name for area in student.research_areas]
         )
         for student in results
     ]
 
-@app.get("/analytics/yearly-trends/", response_model=YearlyTrends)
+@router.get("/analytics/yearly-trends/", response_model=YearlyTrends)
 def get_yearly_trends(db: Session = Depends(get_db)):
     return crud.get_yearly_trends(db)
 
-@app.get("/analytics/department-publications/", response_model=List[DepartmentPublications])
+@router.get("/analytics/trends/", response_model=schemas.TrendsResponse)
+def get_trends_endpoint(
+    entity: str = 'projects',
+    dimensions: str = 'year',
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    grouping: str = 'sets',
+    date_field: str = 'start_date',
+    db: Session = Depends(get_db)
+):
+    """Counts broken down by every requested dimension, returned column-wise"""
+    if entity not in crud.TREND_DIMENSIONS:
+        raise HTTPException(status_code=400, detail="Invalid entity, expected 'projects' or 'publications'")
+    requested = [d.strip() for d in dimensions.split(',') if d.strip()]
+    allowed = crud.TREND_DIMENSIONS[entity]
+    if not requested or any(d not in allowed for d in requested) or len(set(requested)) != len(requested):
+        raise HTTPException(status_code=400, detail=f"Invalid dimensions, expected any of {', '.join(allowed)}")
+    if grouping not in crud.TREND_GROUPINGS:
+        raise HTTPException(status_code=400, detail=f"Invalid grouping, expected one of {', '.join(crud.TREND_GROUPINGS)}")
+    if date_field not in ('start_date', 'end_date'):
+        raise HTTPException(status_code=400, detail="Invalid date_field, expected 'start_date' or 'end_date'")
+    return crud.get_trends(db, entity, requested, start=start, end=end, grouping=grouping, date_field=date_field)
+
+PROJECT_STATUSES = ('Active', 'Completed')
+MAX_HISTOGRAM_BUCKETS = 100
+
+def check_project_status(status: Optional[str]):
+    if status is not None and status not in PROJECT_STATUSES:
+        raise HTTPException(status_code=400, detail="Invalid status, expected 'Active' or 'Completed'")
+
+@router.get("/analytics/funding/percentiles", response_model=List[schemas.FundingDistribution])
+def get_funding_percentiles(
+    percentiles: str = '0.25,0.5,0.75,0.9',
+    by_department: bool = True,
+    department_id: Optional[int] = None,
+    status: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """percentile_cont over project funding, per department and overall"""
+    check_project_status(status)
+    try:
+        requested = sorted({float(p) for p in percentiles.split(',') if p.strip()})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="percentiles must be comma-separated numbers")
+    if not requested or any(p < 0 or p > 1 for p in requested):
+        raise HTTPException(status_code=400, detail="percentiles must be between 0 and 1")
+    return crud.get_funding_percentiles(
+        db, requested, by_department=by_department, department_id=department_id, status=status
+    )
+
+@router.get("/analytics/funding/histogram", response_model=schemas.FundingHistogram)
+def get_funding_histogram(
+    buckets: int = 10,
+    low: Optional[float] = None,
+    high: Optional[float] = None,
+    department_id: Optional[int] = None,
+    status: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Equal-width funding histogram (width_bucket) with below/above counts for explicit bounds"""
+    check_project_status(status)
+    if buckets < 1 or buckets > MAX_HISTOGRAM_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"buckets must be between 1 and {MAX_HISTOGRAM_BUCKETS}")
+    if low is not None and high is not None and low >= high:
+        raise HTTPException(status_code=400, detail="low must be less than high")
+    return crud.get_funding_histogram(
+        db, buckets=buckets, low=low, high=high, department_id=department_id, status=status
+    )
+
+@router.get("/analytics/funding/monthly", response_model=List[schemas.MonthlyFunding])
+def get_monthly_funding(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    department_id: Optional[int] = None,
+    status: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Active projects and funding per month, each project counted across its start_date-end_date range.
+    Defaults to the last 24 months."""
+    check_project_status(status)
+    end = end or date.today()
+    if start is None:
+        months_back = end.year * 12 + end.month - 1 - 23
+        start = date(months_back // 12, months_back % 12 + 1, 1)
+    months = (end.year - start.year) * 12 + end.month - start.month + 1
+    if months < 1:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if months > crud.MAX_FUNDING_MONTHS:
+        raise HTTPException(status_code=400, detail=f"At most {crud.MAX_FUNDING_MONTHS} months per request")
+    return crud.get_monthly_funding(db, start, end, department_id=department_id, status=status)
+
+@router.get("/analytics/department-publications/", response_model=List[DepartmentPublications])
 def get_department_publications(db: Session = Depends(get_db)):
     results = crud.get_department_publications(db)
     return [
@@ -569,11 +1343,11 @@ def get_department_publications(db: Session = Depends(get_db)):
         for dept, count in results
     ]
 
-@app.get("/analytics/system-stats/", response_model=SystemStats)
+@router.get("/analytics/system-stats/", response_model=SystemStats)
 def get_system_stats(db: Session = Depends(get_db)):
     return crud.get_system_stats(db)
 
-@app.get("/analytics/department-total-funding/", response_model=List[DepartmentTotalFunding])
+@router.get("/analytics/department-total-funding/", response_model=List[DepartmentTotalFunding])
 def get_department_total_funding(db: Session = Depends(get_db)):
     results = crud.get_department_total_funding(db)
     return [
@@ -581,9 +1355,10 @@ def get_department_total_funding(db: Session = Depends(get_db)):
         for dept, total in results
     ]
 
-@app.get("/analytics/professors-without-publications/", response_model=List[ProfessorWithoutPublications])
-def get_professors_without_publications(db: Session = Depends(get_db)):
-    results = crud.get_professors_without_publications(db)
+@router.get("/analytics/professors-without-publications/", response_model=List[ProfessorWithoutPublications])
+def get_professors_without_publications(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    """Professors with no authored publication, a page at a time in ID order"""
+    results = crud.get_professors_without_publications(db, skip=max(skip, 0), limit=analytics_page_size(limit))
     return [
         ProfessorWithoutPublications(
             professor_id=prof.professor_id,
@@ -591,13 +1366,13 @@ def get_professors_without_publications(db: Session = Depends(get_db)):
             last_name=prof.last_name,
             email=prof.email,
             title=prof.title,
-            department=prof.department.name if prof.department else None,
+            department=department_name(prof),
             research_areas=[area.name for area in prof.research_areas]
         )
         for prof in results
     ]
 
-@app.get("/analytics/professor-publication-counts/", response_model=List[ProfessorPublicationCount])
+@router.get("/analytics/professor-publication-counts/", response_model=List[ProfessorPublicationCount])
 def get_professor_publication_counts(db: Session = Depends(get_db)):
     results = crud.get_professor_publication_counts(db)
     return [
@@ -606,14 +1381,278 @@ def get_professor_publication_counts(db: Session = Depends(get_db)):
             first_name=first,
             last_name=last,
             publication_count=count,
-            department=crud.get_professor(db, prof_id).department.name 
-                if crud.get_professor(db, prof_id).department 
-                else None
+            department=reference_cache.department_name(department_id)
         )
-        for prof_id, first, last, count in results
+        for prof_id, first, last, count, department_id in results
     ]
 
 
+# Background analytics jobs
+# analysis name -> (endpoint function, accepted params and their types)
+PAGE_PARAMS = {'skip': int, 'limit': int}
+ANALYTICS_JOBS = {
+    'department-funding': (get_department_funding, {}),
+    'departments-above-average': (get_departments_above_average, {}),
+    'average-publications': (get_average_publications, {}),
+    'inactive-professors': (get_inactive_professors_endpoint, PAGE_PARAMS),
+    'small-departments': (get_small_departments_endpoint, {}),
+    'all-emails': (get_all_emails_endpoint, {}),
+    'unassigned-students': (get_unassigned_students, PAGE_PARAMS),
+    'yearly-trends': (get_yearly_trends, {}),
+    'trends': (get_trends_endpoint, {
+        'entity': str,
+        'dimensions': str,
+        'start': Optional[date],
+        'end': Optional[date],
+        'grouping': str,
+        'date_field': str,
+    }),
+    'funding-percentiles': (get_funding_percentiles, {
+        'percentiles': str,
+        'by_department': bool,
+        'department_id': Optional[int],
+        'status': Optional[str],
+    }),
+    'funding-histogram': (get_funding_histogram, {
+        'buckets': int,
+        'low': Optional[float],
+        'high': Optional[float],
+        'department_id': Optional[int],
+        'status': Optional[str],
+    }),
+    'funding-monthly': (get_monthly_funding, {
+        'start': Optional[date],
+        'end': Optional[date],
+        'department_id': Optional[int],
+        'status': Optional[str],
+    }),
+    'department-publications': (get_department_publications, {}),
+    'system-stats': (get_system_stats, {}),
+    'department-total-funding': (get_department_total_funding, {}),
+    'professors-without-publications': (get_professors_without_publications, PAGE_PARAMS),
+    'professor-publication-counts': (get_professor_publication_counts, {}),
+}
+
+def format_job(job) -> schemas.JobResponse:
+    return schemas.JobResponse(
+        job_id=job.job_id,
+        analysis=job.name,
+        params=job.params,
+        status=job.status,
+        submitted_at=job.submitted_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        result=job.result,
+        error=job.error
+    )
+
+@router.post("/jobs/analytics", response_model=schemas.JobResponse, status_code=202)
+def submit_analytics_job(job: schemas.JobSubmit, request: Request):
+    """Run an analytics query in the background; identical in-flight jobs are shared"""
+    if job.analysis not in ANALYTICS_JOBS:
+        raise HTTPException(status_code=400, detail=f"Unknown analysis, expected one of {', '.join(ANALYTICS_JOBS)}")
+    fn, accepted = ANALYTICS_JOBS[job.analysis]
+    unknown = [name for name in job.params if name not in accepted]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown params: {', '.join(unknown)}")
+    try:
+        params = {name: parse_obj_as(accepted[name], value) for name, value in job.params.items()}
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        submitted = request.app.state.job_manager.submit(job.analysis, params, fn)
+    except JobQueueFull:
+        raise HTTPException(status_code=503, detail="Too many analytics jobs in flight", headers={"Retry-After": "5"})
+    return format_job(submitted)
+
+@router.get("/jobs/{job_id}", response_model=schemas.JobResponse)
+async def read_job(job_id: str, request: Request, wait: float = 0):
+    """Job status and result; `wait` long-polls up to 30 seconds for completion without holding a thread"""
+    job_manager = request.app.state.job_manager
+    job = job_manager.get(job_id)
+    if not job:
+        # Jobs live in the worker process that accepted them
+        raise HTTPException(status_code=404, detail="Job not found in this worker")
+    job = await job_manager.wait(job, min(max(wait, 0), 30))
+    return await run_in_threadpool(format_job, job)
+
+
+# Batch
+@router.post("/batch", response_model=schemas.BatchResponse)
+async def run_batch(batch: schemas.BatchRequest, request: Request):
+    """Run GET sub-requests in order on one session and snapshot; each keeps its own status"""
+    limit = request.app.state.settings.batch_max_requests
+    if len(batch.requests) > limit:
+        raise HTTPException(status_code=400, detail=f"At most {limit} sub-requests per batch")
+    db = SessionLocal()
+    token = database.shared_session.set(db)
+    responses = []
+    try:
+        await run_in_threadpool(begin_snapshot, db)
+        for sub in batch.requests:
+            response = await request.app.state.batch.run(request.scope, sub.path)
+            if response.status >= 500:
+                # A failed statement aborts the transaction; the rest run on a fresh one
+                await run_in_threadpool(db.rollback)
+                await run_in_threadpool(begin_snapshot, db)
+            responses.append(response.encode(sub.path))
+    finally:
+        database.shared_session.reset(token)
+        await run_in_threadpool(db.close)
+    return Response(b'{"responses": [' + b', '.join(responses) + b']}', media_type='application/json')
+
+
+@router.get("/internal/limits", response_model=Dict[str, schemas.RouteClassLimits])
+def read_admission_limits(request: Request):
+    """Admission control state per route class, for monitoring"""
+    admission = getattr(request.app.state, 'admission', None)
+    if admission is None:
+        raise HTTPException(status_code=404, detail="Admission control is disabled")
+    return admission.stats()
+
+
+@router.get("/internal/coalescing", response_model=schemas.CoalescingStats)
+def read_coalescing_stats(request: Request):
+    """Single-flight counters: requests that ran the query vs. ones that shared it"""
+    single_flight = getattr(request.app.state, 'single_flight', None)
+    if single_flight is None:
+        raise HTTPException(status_code=404, detail="Request coalescing is disabled")
+    return single_flight.stats()
+
+
+def get_profiler(request: Request, x_profile: Optional[str]) -> Profiler:
+    profiler = getattr(request.app.state, 'profiler', None)
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    # Profiles show internals and SQL; Settings refuses to enable profiling without a token
+    if not profiler.authorized(x_profile):
+        raise HTTPException(status_code=403, detail="X-Profile token required")
+    return profiler
+
+@router.get("/internal/profiles", response_model=List[schemas.ProfileSummary])
+def list_profiles(request: Request, x_profile: Optional[str] = Header(None)):
+    """Stored request profiles, newest first"""
+    return get_profiler(request, x_profile).store.list()
+
+@router.get("/internal/profiles/{profile_id}", response_model=schemas.ProfileDetail)
+def read_profile(
+    profile_id: str,
+    request: Request,
+    sort: str = 'cumulative',
+    limit: int = 30,
+    x_profile: Optional[str] = Header(None)
+):
+    """One profile: its SQL statement timeline and the top functions by `sort`"""
+    store = get_profiler(request, x_profile).store
+    if sort not in profiling.SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort, expected one of {', '.join(profiling.SORT_KEYS)}")
+    profile = store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return {**profile, 'functions': store.top_functions(profile_id, sort, max(1, min(limit, 500)))}
+
+@router.get("/internal/profiles/{profile_id}/download")
+def download_profile(profile_id: str, request: Request, x_profile: Optional[str] = Header(None)):
+    """The raw profile in pstats format, for snakeviz or `python -m pstats`"""
+    path = get_profiler(request, x_profile).store.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type='application/octet-stream', filename=f"{profile_id}.prof")
+
+
+def load_reference_cache():
+    db = SessionLocal()
+    try:
+        reference_cache.load(db)
+    finally:
+        db.close()
+
+
+def warmup(settings: Settings):
+    """Fill the connection pool and the compiled-statement cache before serving"""
+    database.warm_pool(settings.warmup_connections or settings.db_pool_size)
+    db = SessionLocal()
+    try:
+        crud.warm_statement_cache(db)
+        read_models.warm_statement_cache(db)
+        directory_index.ensure_loaded(db)
+    finally:
+        db.close()
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """Build the application; the database is not touched until startup"""
+    settings = settings or Settings()
+    database.configure(settings)
+
+    application = FastAPI(dependencies=[Depends(refresh_reference_cache)])
+    application.state.settings = settings
+    application.state.job_manager = JobManager.from_settings(settings)
+
+    @application.on_event("startup")
+    def startup():
+        load_reference_cache()
+        if settings.warmup:
+            warmup(settings)
+
+    @application.on_event("startup")
+    async def watch_changes():
+        application.state.change_watch = asyncio.create_task(
+            clear_on_changes(application.state.analytics_cache, ChangeTail(tuple(crud.SYNC_ENTITIES.values())))
+        )
+
+    @application.on_event("shutdown")
+    def shutdown():
+        application.state.job_manager.shutdown()
+        application.state.change_watch.cancel()
+
+    if settings.profiling_enabled:
+        # Innermost, so a profile covers the application and not the admission queue
+        application.state.profiler = Profiler.from_settings(settings)
+        application.add_middleware(ProfilingMiddleware, profiler=application.state.profiler)
+
+    if settings.admission_enabled:
+        application.state.admission = AdmissionController.from_settings(settings)
+        application.add_middleware(AdmissionMiddleware, controller=application.state.admission)
+
+    if settings.coalesce_enabled:
+        # Outside admission control, so requests that join an in-flight one take no slot
+        application.state.single_flight = SingleFlight(timeout=settings.coalesce_timeout)
+        application.add_middleware(CoalescingMiddleware, single_flight=application.state.single_flight)
+
+    application.add_middleware(
+        CORSMiddleware,
+        allow_origins=[o.strip() for o in settings.cors_origins.split(',') if o.strip()],  # Frontend link
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[
+            "X-Total-Count", "X-Total-Count-Exact", "X-Missing-IDs", "X-Deleted-IDs", "X-Sync-Timestamp"
+        ],
+    )
+
+    # Shared by the middleware and /batch, so batched analytics reads hit the same entries
+    application.state.analytics_cache = ResponseCache(ttl=settings.analytics_cache_ttl)
+    application.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_min_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+        cache=application.state.analytics_cache
+    )
+    application.include_router(router)
+    application.state.batch = BatchDispatcher(
+        application, getattr(application.state, 'admission', None), application.state.analytics_cache
+    )
+    if settings.profiling_enabled:
+        profiling.instrument(application)
+    return application
+
+
+# `uvicorn app.main:app`, or `uvicorn --factory app.main:create_app` for a fresh app per worker
+app = create_app()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,313 @@
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+from .changes import ChangeTail
+
+METRICS = ('jaccard', 'cosine')
+# Cells in the dense students x professors arrays scored per chunk; a few
+# float64 arrays of this size (32 MiB each) are alive at once.
+MAX_CHUNK_CELLS = 4 * 1024 * 1024
+NO_DEPARTMENT = -1
+
+
+class _Rows:
+    """Per-entity rows of an incidence matrix, keyed by entity ID."""
+
+    def __init__(self):
+        self.ids: List[int] = []
+        self.index: Dict[int, int] = {}
+        self.areas: List[List[int]] = []
+        self.departments: List[int] = []
+        self.active: List[bool] = []
+
+    def upsert(self, entity_id: int, areas: List[int], department_id: Optional[int]) -> int:
+        row = self.index.get(entity_id)
+        department = department_id if department_id is not None else NO_DEPARTMENT
+        if row is None:
+            row = len(self.ids)
+            self.index[entity_id] = row
+            self.ids.append(entity_id)
+            self.areas.append(areas)
+            self.departments.append(department)
+            self.active.append(True)
+        else:
+            self.areas[row] = areas
+            self.departments[row] = department
+            self.active[row] = True
+        return row
+
+    def remove(self, entity_id: int) -> Optional[int]:
+        row = self.index.get(entity_id)
+        if row is not None:
+            self.areas[row] = []
+            self.active[row] = False
+        return row
+
+    def matrix(self, n_areas: int) -> sparse.csr_matrix:
+        indptr = np.zeros(len(self.areas) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(a) for a in self.areas])
+        indices = np.fromiter(
+            (col for areas in self.areas for col in areas), dtype=np.int64, count=int(indptr[-1])
+        )
+        data = np.ones(len(indices), dtype=np.float64)
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(self.areas), n_areas))
+
+
+class _Snapshot:
+    """Immutable matrices used to score one batch of students."""
+
+    def __init__(
+        self, professors: _Rows, students: _Rows, names: Dict[int, str], advisee_counts: Counter, n_areas: int
+    ):
+        self.professor_ids = np.array(professors.ids, dtype=np.int64)
+        self.professor_names = [names.get(pid) for pid in professors.ids]
+        self.professor_matrix_t = professors.matrix(n_areas).T.tocsr()
+        self.professor_sizes = np.asarray(self.professor_matrix_t.sum(axis=0)).ravel()
+        self.professor_departments = np.array(professors.departments, dtype=np.int64)
+        self.professor_active = np.array(professors.active, dtype=bool)
+        self.professor_load = np.array([advisee_counts.get(pid, 0) for pid in professors.ids], dtype=np.int64)
+        self.student_ids = np.array(students.ids, dtype=np.int64)
+        self.student_index = dict(students.index)
+        self.student_matrix = students.matrix(n_areas)
+        self.student_sizes = np.asarray(self.student_matrix.sum(axis=1)).ravel()
+        self.student_departments = np.array(students.departments, dtype=np.int64)
+
+
+class AdvisorMatcher:
+    """In-memory professor x area and student x area incidence matrices.
+
+    The matrices are loaded once from the junction tables and then kept in
+    sync by the write endpoints, which refresh only the rows they touched.
+    Other workers' writes are picked up from the change feed when the
+    matcher is next used, at most every CHANGE_CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._snapshot: Optional[_Snapshot] = None
+        self._changes = ChangeTail(('professor', 'student'))
+        self._reset()
+
+    def _reset(self):
+        self._professors = _Rows()
+        self._students = _Rows()
+        self._area_index: Dict[int, int] = {}
+        self._names: Dict[int, str] = {}
+        self._advisors: Dict[int, Optional[int]] = {}
+        self._snapshot = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def _area_columns(self, area_ids) -> List[int]:
+        columns = []
+        for area_id in area_ids:
+            if area_id not in self._area_index:
+                self._area_index[area_id] = len(self._area_index)
+            columns.append(self._area_index[area_id])
+        return sorted(set(columns))
+
+    def load(self, db: Session):
+        self._changes.start(db)
+        professors = db.execute(
+            select(
+                models.Professor.professor_id,
+                models.Professor.first_name,
+                models.Professor.last_name,
+                models.Professor.department_id
+            )
+        ).all()
+        students = db.execute(
+            select(
+                models.GradStudent.student_id,
+                models.GradStudent.department_id,
+                models.GradStudent.advisor_id
+            )
+        ).all()
+        professor_areas = _group_areas(db.execute(select(
+            models.professor_research_areas.c.professor_id,
+            models.professor_research_areas.c.area_id
+        )).all())
+        student_areas = _group_areas(db.execute(select(
+            models.student_research_areas.c.student_id,
+            models.student_research_areas.c.area_id
+        )).all())
+
+        with self._lock:
+            self._reset()
+            for professor_id, first_name, last_name, department_id in professors:
+                self._names[professor_id] = f"{first_name} {last_name}"
+                self._professors.upsert(
+                    professor_id, self._area_columns(professor_areas.get(professor_id, [])), department_id
+                )
+            for student_id, department_id, advisor_id in students:
+                self._advisors[student_id] = advisor_id
+                self._students.upsert(
+                    student_id, self._area_columns(student_areas.get(student_id, [])), department_id
+                )
+            self._loaded = True
+
+    def ensure_loaded(self, db: Session):
+        if not self._loaded:
+            self.load(db)
+            return
+        changed = self._changes.poll(db)
+        if changed is None:
+            self.load(db)
+            return
+        for entity, entity_id in changed:
+            if entity == 'professor':
+                self.refresh_professor(db, entity_id)
+            else:
+                self.refresh_student(db, entity_id)
+
+    def refresh_professor(self, db: Session, professor_id: int):
+        if not self._loaded:
+            return
+        professor = db.execute(
+            select(
+                models.Professor.first_name,
+                models.Professor.last_name,
+                models.Professor.department_id
+            ).where(models.Professor.professor_id == professor_id)
+        ).first()
+        if professor is None:
+            self.remove_professor(professor_id)
+            return
+        area_ids = db.execute(
+            select(models.professor_research_areas.c.area_id)
+            .where(models.professor_research_areas.c.professor_id == professor_id)
+        ).scalars().all()
+        with self._lock:
+            self._names[professor_id] = f"{professor.first_name} {professor.last_name}"
+            self._professors.upsert(professor_id, self._area_columns(area_ids), professor.department_id)
+            self._snapshot = None
+
+    def remove_professor(self, professor_id: int):
+        with self._lock:
+            self._professors.remove(professor_id)
+            self._names.pop(professor_id, None)
+            self._snapshot = None
+
+    def refresh_student(self, db: Session, student_id: int):
+        if not self._loaded:
+            return
+        student = db.execute(
+            select(models.GradStudent.department_id, models.GradStudent.advisor_id)
+            .where(models.GradStudent.student_id == student_id)
+        ).first()
+        if student is None:
+            self.remove_student(student_id)
+            return
+        area_ids = db.execute(
+            select(models.student_research_areas.c.area_id)
+            .where(models.student_research_areas.c.student_id == student_id)
+        ).scalars().all()
+        with self._lock:
+            self._advisors[student_id] = student.advisor_id
+            self._students.upsert(student_id, self._area_columns(area_ids), student.department_id)
+            self._snapshot = None
+
+    def remove_student(self, student_id: int):
+        with self._lock:
+            self._students.remove(student_id)
+            self._advisors.pop(student_id, None)
+            self._snapshot = None
+
+    def _current_snapshot(self) -> _Snapshot:
+        with self._lock:
+            if self._snapshot is None:
+                advisee_counts = Counter(a for a in self._advisors.values() if a is not None)
+                self._snapshot = _Snapshot(
+                    self._professors, self._students, self._names, advisee_counts,
+                    max(len(self._area_index), 1)
+                )
+            return self._snapshot
+
+    def unassigned_student_ids(self, db: Session) -> List[int]:
+        self.ensure_loaded(db)
+        with self._lock:
+            return sorted(sid for sid, advisor_id in self._advisors.items() if advisor_id is None)
+
+    def match_students(
+        self,
+        db: Session,
+        student_ids: List[int],
+        k: int = 5,
+        metric: str = 'jaccard',
+        same_department: bool = True,
+        max_load: Optional[int] = None
+    ) -> Dict[int, List[dict]]:
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}'")
+        self.ensure_loaded(db)
+        snapshot = self._current_snapshot()
+
+        rows = [snapshot.student_index[sid] for sid in student_ids if sid in snapshot.student_index]
+        results: Dict[int, List[dict]] = {}
+        n_professors = len(snapshot.professor_ids)
+        if not rows or n_professors == 0 or k <= 0:
+            return {sid: [] for sid in student_ids if sid in snapshot.student_index}
+
+        eligible = snapshot.professor_active.copy()
+        if max_load is not None:
+            eligible &= snapshot.professor_load < max_load
+
+        top = min(k, n_professors)
+        chunk_size = max(1, MAX_CHUNK_CELLS // n_professors)
+        for start in range(0, len(rows), chunk_size):
+            chunk = np.array(rows[start:start + chunk_size], dtype=np.int64)
+            shared = (snapshot.student_matrix[chunk] @ snapshot.professor_matrix_t).toarray()
+            student_sizes = snapshot.student_sizes[chunk][:, None]
+            professor_sizes = snapshot.professor_sizes[None, :]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                if metric == 'jaccard':
+                    scores = shared / (student_sizes + professor_sizes - shared)
+                else:
+                    scores = shared / np.sqrt(student_sizes * professor_sizes)
+
+            mask = (shared > 0) & eligible[None, :]
+            if same_department:
+                departments = snapshot.student_departments[chunk][:, None]
+                mask &= (departments == NO_DEPARTMENT) | (departments == snapshot.professor_departments[None, :])
+            scores = np.where(mask, scores, -np.inf)
+
+            candidates = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+            candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+            order = np.argsort(-candidate_scores, axis=1, kind='stable')
+            candidates = np.take_along_axis(candidates, order, axis=1)
+
+            for i, row in enumerate(chunk):
+                matches = []
+                for col in candidates[i]:
+                    score = scores[i, col]
+                    if not np.isfinite(score):
+                        break
+                    matches.append({
+                        'professor_id': int(snapshot.professor_ids[col]),
+                        'name': snapshot.professor_names[col],
+                        'score': round(float(score), 4),
+                        'shared_areas': int(shared[i, col]),
+                        'advisee_count': int(snapshot.professor_load[col])
+                    })
+                results[int(snapshot.student_ids[row])] = matches
+        return results
+
+
+def _group_areas(pairs) -> Dict[int, List[int]]:
+    grouped: Dict[int, List[int]] = {}
+    for entity_id, area_id in pairs:
+        grouped.setdefault(entity_id, []).append(area_id)
+    return grouped
+
+
+advisor_matcher = AdvisorMatcher()
@@ -1,20 +1,33 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, Numeric, Enum, Text, Table
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, Date, DateTime, Numeric, Enum, Text, Table, Index, JSON, DDL, func, event, update
+from sqlalchemy.orm import Session, relationship, declarative_base
 from .database import Base
 
+def version_column():
+    """Row version for optimistic concurrency, bumped by every ORM UPDATE of the row"""
+    return Column(Integer, nullable=False, server_default='1')
+
+def updated_at_column(name=None):
+    args = (name,) if name else ()
+    return Column(
+        *args, DateTime(timezone=True), nullable=False,
+        server_default=func.now(), onupdate=func.now(), index=True
+    )
+
 # Junction tables
 professor_research_areas = Table(
     'professor_research_areas',
     Base.metadata,
     Column('professor_id', Integer, ForeignKey('professor.professor_id'), primary_key=True),
-    Column('area_id', Integer, ForeignKey('research_area.area_id'), primary_key=True)
+    Column('area_id', Integer, ForeignKey('research_area.area_id'), primary_key=True),
+    updated_at_column('updated_at')
 )
 
 student_research_areas = Table(
     'student_research_areas',
     Base.metadata,
     Column('student_id', Integer, ForeignKey('gradstudent.student_id'), primary_key=True),
-    Column('area_id', Integer, ForeignKey('research_area.area_id'), primary_key=True)
+    Column('area_id', Integer, ForeignKey('research_area.area_id'), primary_key=True),
+    updated_at_column('updated_at')
 )
 
 class Department(Base):
@@ -39,8 +52,11 @@ class Professor(Base):
     image_url = Column(String(200))
     department_id = Column(Integer, ForeignKey('department.department_id'))
     department = relationship("Department")
+    updated_at = updated_at_column()
     research_areas = relationship("ResearchArea", secondary=professor_research_areas)
     project_associations = relationship("ProfessorProject", back_populates="professor")
+    version = version_column()
+    __mapper_args__ = {'version_id_col': version}
 
 class GradStudent(Base):
     __tablename__ = 'gradstudent'
@@ -51,19 +67,22 @@ class GradStudent(Base):
     enrollment_date = Column(Date, nullable=False)
     type = Column(String(20))
     image_url = Column(String(200))
-    advisor_id = Column(Integer, ForeignKey('professor.professor_id'))
+    advisor_id = Column(Integer, ForeignKey('professor.professor_id'), index=True)
     advisor = relationship("Professor")
     department_id = Column(Integer, ForeignKey('department.department_id'))
     department = relationship("Department")
+    updated_at = updated_at_column()
     research_areas = relationship("ResearchArea", secondary=student_research_areas)
     project_associations = relationship("StudentProject", back_populates="student")
+    version = version_column()
+    __mapper_args__ = {'version_id_col': version}
 
 class Project(Base):
     __tablename__ = 'project'
     project_id = Column(Integer, primary_key=True)
     title = Column(String(200), nullable=False)
-    start_date = Column(Date, nullable=False)
-    end_date = Column(Date)
+    start_date = Column(Date, nullable=False, index=True)
+    end_date = Column(Date, index=True)
     status = Column(Enum('Active', 'Completed', name='project_status'))
     funding_amount = Column(Numeric(10,2))
     funding_source = Column(String(100), nullable=False)
@@ -72,10 +91,16 @@ class Project(Base):
     lead_professor = relationship("Professor")
     department_id = Column(Integer, ForeignKey('department.department_id'))
     department = relationship("Department")
+    updated_at = updated_at_column()
     professor_associations = relationship("ProfessorProject", back_populates="project")
     student_associations = relationship("StudentProject", back_populates="project")
     professors = relationship("Professor", secondary="professor_project", viewonly=True)
     students = relationship("GradStudent", secondary="student_project", viewonly=True)
+    version = version_column()
+    __mapper_args__ = {'version_id_col': version}
+    __table_args__ = (
+        Index('ix_project_lead_professor_status', 'lead_professor_id', 'status'),
+    )
 
 class Journal(Base):
     __tablename__ = 'journal'
@@ -88,20 +113,25 @@ class Publication(Base):
     title = Column(String(200), nullable=False)
     journal_id = Column(Integer, ForeignKey('journal.journal_id'))
     journal = relationship("Journal")
-    year = Column(Integer, nullable=False)
+    year = Column(Integer, nullable=False, index=True)
     volume = Column(String(20))
     issue = Column(String(20))
     pages = Column(String(20))
     citations = Column(Integer, default=0)
     abstract = Column(Text)
+    updated_at = updated_at_column()
     professor_authors = relationship("ProfessorAuthor", back_populates="publication")
     student_authors = relationship("StudentAuthor", back_populates="publication")
+    version = version_column()
+    __mapper_args__ = {'version_id_col': version}
 
 class ProfessorAuthor(Base):
     __tablename__ = 'professor_authors'
     publication_id = Column(Integer, ForeignKey('publication.publication_id'), primary_key=True)
-    professor_id = Column(Integer, ForeignKey('professor.professor_id'), primary_key=True)
+    # Indexed on its own for lookups by professor; the primary key leads with publication_id
+    professor_id = Column(Integer, ForeignKey('professor.professor_id'), primary_key=True, index=True)
     author_order = Column(Integer, nullable=False)
+    updated_at = updated_at_column()
     professor = relationship("Professor")
     publication = relationship("Publication", back_populates="professor_authors")
 
@@ -110,6 +140,7 @@ class StudentAuthor(Base):
     publication_id = Column(Integer, ForeignKey('publication.publication_id'), primary_key=True)
     student_id = Column(Integer, ForeignKey('gradstudent.student_id'), primary_key=True)
     author_order = Column(Integer, nullable=False)
+    updated_at = updated_at_column()
     student = relationship("GradStudent")
     publication = relationship("Publication", back_populates="student_authors")
 
@@ -118,13 +149,104 @@ class ProfessorProject(Base):
     project_id = Column(Integer, ForeignKey('project.project_id'), primary_key=True)
     professor_id = Column(Integer, ForeignKey('professor.professor_id'), primary_key=True)
     role = Column(String(50))
+    updated_at = updated_at_column()
     professor = relationship("Professor", back_populates="project_associations")
     project = relationship("Project", back_populates="professor_associations")
 
 class StudentProject(Base):
     __tablename__ = 'student_project'
     project_id = Column(Integer, ForeignKey('project.project_id'), primary_key=True)
-    student_id = Column(Integer, ForeignKey('gradstudent.student_id'), primary_key=True)
+    student_id = Column(Integer, ForeignKey('gradstudent.student_id'), primary_key=True, index=True)
     role = Column(String(50))
+    updated_at = updated_at_column()
     student = relationship("GradStudent", back_populates="project_associations")
-    project = relationship("Project", back_populates="student_associations")
\ No newline at end of file
+    project = relationship("Project", back_populates="student_associations")
+
+# Association changes bump the parent's updated_at so updated_since picks the parent up
+def _touch_collection_owner(target, value, initiator):
+    target.updated_at = func.now()
+
+# Trigram indexes for the fuzzy directory search (PostgreSQL with the pg_trgm extension)
+event.listen(Base.metadata, 'before_create', DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect='postgresql'))
+for _table in (Professor.__table__, GradStudent.__table__):
+    event.listen(_table, 'after_create', DDL(
+        "CREATE INDEX IF NOT EXISTS ix_%(table)s_full_name_trgm ON %(table)s "
+        "USING gin ((first_name || ' ' || last_name) gin_trgm_ops)"
+    ).execute_if(dialect='postgresql'))
+    event.listen(_table, 'after_create', DDL(
+        "CREATE INDEX IF NOT EXISTS ix_%(table)s_email_trgm ON %(table)s USING gin (email gin_trgm_ops)"
+    ).execute_if(dialect='postgresql'))
+
+for _collection in (Professor.research_areas, GradStudent.research_areas):
+    event.listen(_collection, 'append', _touch_collection_owner)
+    event.listen(_collection, 'remove', _touch_collection_owner)
+
+ASSOCIATION_PARENTS = {
+    ProfessorAuthor: (Publication, 'publication_id'),
+    StudentAuthor: (Publication, 'publication_id'),
+    ProfessorProject: (Project, 'project_id'),
+    StudentProject: (Project, 'project_id'),
+}
+
+@event.listens_for(Session, 'after_flush')
+def _touch_association_parents(session, flush_context):
+    touched = {}
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        parent = ASSOCIATION_PARENTS.get(type(obj))
+        if parent is not None:
+            touched.setdefault(parent, set()).add(getattr(obj, parent[1]))
+    for (model, key), parent_ids in touched.items():
+        session.connection().execute(
+            update(model.__table__)
+            .where(model.__table__.c[key].in_(parent_ids))
+            .values(updated_at=func.now())
+        )
+
+
+# Precomputed citation metrics, scope is 'professor' or 'department'
+class CitationMetrics(Base):
+    __tablename__ = 'citation_metrics'
+    scope = Column(String(20), primary_key=True)
+    entity_id = Column(Integer, primary_key=True)
+    h_index = Column(Integer, nullable=False, default=0)
+    i10_index = Column(Integer, nullable=False, default=0)
+    total_citations = Column(Integer, nullable=False, default=0)
+    publication_count = Column(Integer, nullable=False, default=0)
+    __table_args__ = (
+        Index('ix_citation_metrics_h_index', 'scope', 'h_index'),
+        Index('ix_citation_metrics_i10_index', 'scope', 'i10_index'),
+        Index('ix_citation_metrics_total_citations', 'scope', 'total_citations'),
+    )
+
+class CitationTopPublication(Base):
+    __tablename__ = 'citation_top_publications'
+    scope = Column(String(20), primary_key=True)
+    entity_id = Column(Integer, primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    publication_id = Column(Integer, ForeignKey('publication.publication_id', ondelete='CASCADE'), nullable=False)
+    citations = Column(Integer, nullable=False, default=0)
+    publication = relationship("Publication")
+
+# Bumped whenever department, research_area or journal rows are written
+class ReferenceDataVersion(Base):
+    __tablename__ = 'reference_data_version'
+    table_name = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+# Transactional outbox, one row per create/update/delete written by crud.py
+class ChangeEvent(Base):
+    __tablename__ = 'change_event'
+    # SQLite only autoincrements INTEGER primary keys (used by the tools/ benchmarks)
+    seq = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    entity = Column(String(30), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String(10), nullable=False)
+    data = Column(JSON)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
+
+# Single row (id 1): change events created before pruned_before, up to seq pruned_through_seq, were deleted
+class ChangeRetention(Base):
+    __tablename__ = 'change_retention'
+    id = Column(Integer, primary_key=True)
+    pruned_before = Column(DateTime(timezone=True), nullable=False)
+    pruned_through_seq = Column(BigInteger, nullable=False)
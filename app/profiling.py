@@ -0,0 +1,283 @@
+import asyncio
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from typing import List, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from .config import Settings
+
+PROFILE_HEADER = 'x-profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+# The profile endpoints themselves, and the stream that never finishes
+EXEMPT_PREFIXES = ('/internal/', '/changes/stream')
+PROFILE_ID = re.compile(r'^\d{8}T\d{12}-[0-9a-f]{8}$')
+SORT_KEYS = {'cumulative': 3, 'tottime': 2, 'calls': 1}
+
+current_profile: ContextVar[Optional['RequestProfile']] = ContextVar('current_profile', default=None)
+
+
+class RequestProfile:
+    """cProfile data and the SQL statement timeline of one request.
+
+    The event loop thread has one profiler for the whole request; each sync
+    endpoint call gets its own in the worker thread that runs it, and they
+    are merged when the profile is saved.
+    """
+
+    def __init__(self, method: str, path: str, query: str, trigger: str):
+        self.started_at = datetime.utcnow()
+        self.profile_id = f"{self.started_at:%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+        self.method = method
+        self.path = path
+        self.query = query
+        self.trigger = trigger
+        self.status: Optional[int] = None
+        self.duration_ms = 0.0
+        self.statements: List[dict] = []
+        self.loop_profile = cProfile.Profile()
+        self._start = time.perf_counter()
+        self._thread_profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def offset_ms(self, at: float) -> float:
+        return round((at - self._start) * 1000, 3)
+
+    def run_in_thread(self, fn, args, kwargs):
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            with self._lock:
+                self._thread_profiles.append(profile)
+
+    def add_statement(self, start: float, end: float, statement: str, rows: int, executemany: bool):
+        # Statement text only: bound parameters can hold personal data
+        with self._lock:
+            self.statements.append({
+                'start_ms': self.offset_ms(start),
+                'duration_ms': round((end - start) * 1000, 3),
+                'sql': statement,
+                'rows': rows if rows >= 0 else None,
+                'executemany': executemany,
+            })
+
+    def finish(self):
+        self.duration_ms = self.offset_ms(time.perf_counter())
+
+    def stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self.loop_profile)
+        for profile in self._thread_profiles:
+            stats.add(profile)
+        return stats
+
+    def summary(self) -> dict:
+        return {
+            'profile_id': self.profile_id,
+            'method': self.method,
+            'path': self.path,
+            'query': self.query,
+            'trigger': self.trigger,
+            'status': self.status,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': self.duration_ms,
+            'statement_count': len(self.statements),
+            'sql_ms': round(sum(s['duration_ms'] for s in self.statements), 3),
+        }
+
+
+class ProfileStore:
+    """Profiles on local disk: <id>.prof (pstats format) and <id>.json (summary + SQL timeline)"""
+
+    def __init__(self, directory: str, max_profiles: int):
+        self.directory = directory
+        self.max_profiles = max_profiles
+
+    def _path(self, profile_id: str, suffix: str) -> Optional[str]:
+        if not PROFILE_ID.match(profile_id):
+            return None
+        return os.path.join(self.directory, profile_id + suffix)
+
+    def save(self, profile: RequestProfile):
+        os.makedirs(self.directory, exist_ok=True)
+        profile.stats().dump_stats(self._path(profile.profile_id, '.prof'))
+        with open(self._path(profile.profile_id, '.json'), 'w') as f:
+            json.dump({**profile.summary(), 'statements': profile.statements}, f)
+        self.prune()
+
+    def _ids(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        # IDs start with the UTC start time, so name order is age order
+        return sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith('.json'))
+
+    def prune(self):
+        ids = self._ids()
+        for profile_id in ids[:max(0, len(ids) - self.max_profiles)]:
+            for suffix in ('.json', '.prof'):
+                try:
+                    os.remove(self._path(profile_id, suffix))
+                except FileNotFoundError:
+                    pass
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        path = self._path(profile_id, '.json')
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def list(self) -> List[dict]:
+        summaries = []
+        for profile_id in reversed(self._ids()):
+            profile = self.get(profile_id)
+            if profile is not None:
+                profile.pop('statements', None)
+                summaries.append(profile)
+        return summaries
+
+    def profile_path(self, profile_id: str) -> Optional[str]:
+        path = self._path(profile_id, '.prof')
+        return path if path is not None and os.path.exists(path) else None
+
+    def top_functions(self, profile_id: str, sort: str = 'cumulative', limit: int = 30) -> List[dict]:
+        path = self.profile_path(profile_id)
+        if path is None:
+            return []
+        rows = pstats.Stats(path).stats.items()
+        rows = sorted(rows, key=lambda item: item[1][SORT_KEYS[sort]], reverse=True)[:limit]
+        return [
+            {
+                'function': f"{function} ({filename}:{line})",
+                'calls': calls,
+                'primitive_calls': primitive_calls,
+                'total_ms': round(total * 1000, 3),
+                'cumulative_ms': round(cumulative * 1000, 3),
+            }
+            for (filename, line, function), (primitive_calls, calls, total, cumulative, _) in rows
+        ]
+
+
+class Profiler:
+    """Which requests to profile, and where their profiles go"""
+
+    def __init__(self, store: ProfileStore, token: Optional[str], sample_rate: float):
+        self.store = store
+        self.token = token
+        self.sample_rate = sample_rate
+        # cProfile allows one profiler per thread, and the event loop is one thread
+        self.active = False
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> 'Profiler':
+        store = ProfileStore(settings.profiling_dir, settings.profiling_max_profiles)
+        return cls(store, settings.profiling_token, settings.profiling_sample_rate)
+
+    def authorized(self, value: Optional[str]) -> bool:
+        return bool(self.token) and value is not None and hmac.compare_digest(value, self.token)
+
+    def trigger(self, scope) -> Optional[str]:
+        if self.authorized(Headers(scope=scope).get(PROFILE_HEADER)):
+            return 'header'
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sample'
+        return None
+
+
+class ProfilingMiddleware:
+    """Runs requests chosen by the Profiler under cProfile and saves the result.
+
+    The response carries X-Profile-Id. The event loop profile also sees any
+    async work of other requests that runs while this one waits, so on a
+    busy worker the sync endpoint part is the cleaner signal.
+    """
+
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or self.profiler.active or scope['path'].startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        trigger = self.profiler.trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(
+            scope['method'], scope['path'], scope.get('query_string', b'').decode('latin-1'), trigger
+        )
+
+        async def send_with_id(message):
+            if message['type'] == 'http.response.start':
+                profile.status = message['status']
+                MutableHeaders(scope=message).append(PROFILE_ID_HEADER, profile.profile_id)
+            await send(message)
+
+        self.profiler.active = True
+        token = current_profile.set(profile)
+        profile.loop_profile.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.loop_profile.disable()
+            profile.finish()
+            current_profile.reset(token)
+            self.profiler.active = False
+            await run_in_threadpool(self.profiler.store.save, profile)
+
+
+def _profiled(fn):
+    @wraps(fn)
+    def call(*args, **kwargs):
+        profile = current_profile.get()
+        if profile is None:
+            return fn(*args, **kwargs)
+        return profile.run_in_thread(fn, args, kwargs)
+    call.profiled = True
+    return call
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile.get() is not None and context is not None:
+        context._profile_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    start = getattr(context, '_profile_start', None)
+    if profile is not None and start is not None:
+        profile.add_statement(start, time.perf_counter(), statement, cursor.rowcount, executemany)
+
+
+def instrument(app):
+    """Hook sync endpoints and SQL execution into the current profile; only called when profiling is on"""
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        call = route.dependant.call
+        # Async endpoints run on the event loop thread, which the middleware already profiles
+        if asyncio.iscoroutinefunction(call) or getattr(call, 'profiled', False):
+            continue
+        route.dependant.call = _profiled(call)
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
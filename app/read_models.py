@@ -0,0 +1,255 @@
+"""Core read models for the entity list and detail responses.
+
+Each entity has one pre-built `select()` returning its columns plus the
+names and lists the response shows, with the lists aggregated to JSON in
+SQL. Rows are mapped straight to dicts shaped like the `schemas.*Response`
+models, so no ORM objects, identity map entries or lazy loads are involved.
+Writes and sparse fieldsets keep going through the ORM in crud.py.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import JSON, bindparam, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.sql.functions import FunctionElement
+
+from . import crud, models
+
+
+class json_array_agg(FunctionElement):
+    """Aggregate into a JSON array: json_agg on PostgreSQL, json_group_array on SQLite"""
+    type = JSON()
+    inherit_cache = True
+
+
+class json_object(FunctionElement):
+    """JSON object from alternating keys and values"""
+    type = JSON()
+    inherit_cache = True
+
+
+@compiles(json_array_agg)
+def _json_array_agg(element, compiler, **kw):
+    return f"json_agg({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(json_array_agg, 'sqlite')
+def _json_array_agg_sqlite(element, compiler, **kw):
+    return f"json_group_array({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(json_object)
+def _json_object(element, compiler, **kw):
+    return f"json_build_object({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(json_object, 'sqlite')
+def _json_object_sqlite(element, compiler, **kw):
+    return f"json_object({compiler.process(element.clauses, **kw)})"
+
+
+def _full_name(person):
+    # NULL when there is no person, like person_name() in main.py
+    return person.first_name + ' ' + person.last_name
+
+
+def _area_names(association, owner_key: str, owner_id):
+    return (
+        select(json_array_agg(models.ResearchArea.name))
+        .select_from(association.join(models.ResearchArea))
+        .where(association.c[owner_key] == owner_id)
+        .scalar_subquery()
+    )
+
+
+def _people(association, person_model, person_key: str, owner_key: str, owner_id, **fields):
+    """JSON array of {name, **fields} for the people linked to one row"""
+    pairs = []
+    for key, value in fields.items():
+        pairs.extend([key, value])
+    return (
+        select(json_array_agg(json_object('name', _full_name(person_model), *pairs)))
+        .select_from(association)
+        .join(person_model, getattr(person_model, person_key) == getattr(association, person_key))
+        .where(getattr(association, owner_key) == owner_id)
+        .scalar_subquery()
+    )
+
+
+_Professor, _Student, _Project, _Publication = (
+    models.Professor, models.GradStudent, models.Project, models.Publication
+)
+_advisor = aliased(models.Professor)
+_lead = aliased(models.Professor)
+
+ROW_STATEMENTS = {
+    _Professor: (
+        select(
+            *_Professor.__table__.columns,
+            models.Department.name.label('department'),
+            _area_names(models.professor_research_areas, 'professor_id', _Professor.professor_id)
+            .label('research_areas'),
+        )
+        .select_from(_Professor)
+        .outerjoin(models.Department, models.Department.department_id == _Professor.department_id)
+    ),
+    _Student: (
+        select(
+            *_Student.__table__.columns,
+            _full_name(_advisor).label('advisor'),
+            models.Department.name.label('department'),
+            _area_names(models.student_research_areas, 'student_id', _Student.student_id)
+            .label('research_areas'),
+        )
+        .select_from(_Student)
+        .outerjoin(_advisor, _advisor.professor_id == _Student.advisor_id)
+        .outerjoin(models.Department, models.Department.department_id == _Student.department_id)
+    ),
+    _Project: (
+        select(
+            *_Project.__table__.columns,
+            _full_name(_lead).label('lead_professor'),
+            models.Department.name.label('department'),
+            _people(
+                models.ProfessorProject, models.Professor, 'professor_id', 'project_id', _Project.project_id,
+                role=models.ProfessorProject.role
+            ).label('professors'),
+            _people(
+                models.StudentProject, models.GradStudent, 'student_id', 'project_id', _Project.project_id,
+                role=models.StudentProject.role
+            ).label('students'),
+        )
+        .select_from(_Project)
+        .outerjoin(_lead, _lead.professor_id == _Project.lead_professor_id)
+        .outerjoin(models.Department, models.Department.department_id == _Project.department_id)
+    ),
+    _Publication: (
+        select(
+            *_Publication.__table__.columns,
+            models.Journal.name.label('journal'),
+            _people(
+                models.ProfessorAuthor, models.Professor, 'professor_id', 'publication_id',
+                _Publication.publication_id, order=models.ProfessorAuthor.author_order
+            ).label('professor_authors'),
+            _people(
+                models.StudentAuthor, models.GradStudent, 'student_id', 'publication_id',
+                _Publication.publication_id, order=models.StudentAuthor.author_order
+            ).label('student_authors'),
+        )
+        .select_from(_Publication)
+        .outerjoin(models.Journal, models.Journal.journal_id == _Publication.journal_id)
+    ),
+}
+# JSON lists that come back NULL for rows with nothing to aggregate
+LIST_FIELDS = {
+    _Professor: ('research_areas',),
+    _Student: ('research_areas',),
+    _Project: ('professors', 'students'),
+    _Publication: (),
+}
+
+BY_ID_STATEMENTS = {
+    model: stmt.where(crud._primary_key(model) == bindparam('entity_id'))
+    for model, stmt in ROW_STATEMENTS.items()
+}
+
+
+def _paged(model, stmt, updated_since: Optional[datetime] = None):
+    """One page of `stmt`; OFFSET skips bare keys, so skipped rows never build their JSON lists"""
+    pk = crud._primary_key(model)
+    keys = select(pk)
+    if updated_since is None:
+        keys, stmt = keys.order_by(pk), stmt.order_by(pk)
+    else:
+        keys, stmt = crud.sync_query(keys, model, updated_since), crud.sync_query(stmt, model, updated_since)
+    page = keys.offset(bindparam('skip')).limit(bindparam('limit')).subquery()
+    return stmt.join(page, pk == page.c[pk.name])
+
+
+PAGE_STATEMENTS = {model: _paged(model, stmt) for model, stmt in ROW_STATEMENTS.items()}
+BY_IDS_STATEMENTS = {
+    model: stmt.where(crud._primary_key(model).in_(bindparam('ids', expanding=True)))
+    for model, stmt in ROW_STATEMENTS.items()
+}
+
+
+def _shape(model, row) -> dict:
+    item = dict(row._mapping)
+    for field in LIST_FIELDS[model]:
+        if item[field] is None:
+            item[field] = []
+    if model is _Publication:
+        professors = [dict(a, type='professor') for a in item.pop('professor_authors') or ()]
+        students = [dict(a, type='student') for a in item.pop('student_authors') or ()]
+        item['authors'] = sorted(professors + students, key=lambda author: author['order'])
+    return item
+
+
+def _read_one(db: Session, model, entity_id: int) -> Optional[dict]:
+    row = db.execute(BY_ID_STATEMENTS[model], {'entity_id': entity_id}).first()
+    return _shape(model, row) if row is not None else None
+
+
+def _read_page(db: Session, model, skip: int, limit: int, updated_since: Optional[datetime]) -> List[dict]:
+    if updated_since is None:
+        stmt = PAGE_STATEMENTS[model]
+    else:
+        stmt = _paged(model, ROW_STATEMENTS[model], updated_since)
+    return [_shape(model, row) for row in db.execute(stmt, {'skip': skip, 'limit': limit})]
+
+
+def _read_many(db: Session, model, ids: List[int]) -> List[dict]:
+    return [_shape(model, row) for row in db.execute(BY_IDS_STATEMENTS[model], {'ids': list(ids)})]
+
+
+def get_professor(db: Session, professor_id: int) -> Optional[dict]:
+    return _read_one(db, _Professor, professor_id)
+
+def get_all_professors(db: Session, skip: int = 0, limit: int = 100, updated_since: Optional[datetime] = None):
+    return _read_page(db, _Professor, skip, limit, updated_since)
+
+def get_professors_by_ids(db: Session, ids: List[int]) -> List[dict]:
+    return _read_many(db, _Professor, ids)
+
+def get_student(db: Session, student_id: int) -> Optional[dict]:
+    return _read_one(db, _Student, student_id)
+
+def get_all_students(db: Session, skip: int = 0, limit: int = 100, updated_since: Optional[datetime] = None):
+    return _read_page(db, _Student, skip, limit, updated_since)
+
+def get_students_by_ids(db: Session, ids: List[int]) -> List[dict]:
+    return _read_many(db, _Student, ids)
+
+def get_project(db: Session, project_id: int) -> Optional[dict]:
+    return _read_one(db, _Project, project_id)
+
+def get_all_projects(db: Session, skip: int = 0, limit: int = 100, updated_since: Optional[datetime] = None):
+    return _read_page(db, _Project, skip, limit, updated_since)
+
+def get_projects_by_ids(db: Session, ids: List[int]) -> List[dict]:
+    return _read_many(db, _Project, ids)
+
+def get_publication(db: Session, publication_id: int) -> Optional[dict]:
+    return _read_one(db, _Publication, publication_id)
+
+def get_all_publications(db: Session, skip: int = 0, limit: int = 100, updated_since: Optional[datetime] = None):
+    return _read_page(db, _Publication, skip, limit, updated_since)
+
+def get_publications_by_ids(db: Session, ids: List[int]) -> List[dict]:
+    return _read_many(db, _Publication, ids)
+
+HOT_READS = (
+    (get_all_professors, get_professor, get_professors_by_ids),
+    (get_all_students, get_student, get_students_by_ids),
+    (get_all_projects, get_project, get_projects_by_ids),
+    (get_all_publications, get_publication, get_publications_by_ids),
+)
+
+def warm_statement_cache(db: Session):
+    """Run each read once so its compiled SQL is cached on the engine"""
+    for get_all, get_one, get_by_ids in HOT_READS:
+        get_all(db, limit=1)
+        get_one(db, 0)
+        get_by_ids(db, [0])
+    db.rollback()
@@ -0,0 +1,124 @@
+import threading
+import time
+from itertools import chain
+from typing import Dict, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from . import models
+
+REFERENCE_MODELS = (models.Department, models.ResearchArea, models.Journal)
+VERSION_CHECK_INTERVAL = 30.0
+
+
+class ReferenceCache:
+    """ID -> name maps for departments, research areas and journals.
+
+    Every write to those tables through a session bumps a per-table row in
+    reference_data_version. This process reloads right after its own commits
+    and notices other workers' writes when it next compares versions, at most
+    every VERSION_CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self, check_interval: float = VERSION_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._versions: Optional[Dict[str, int]] = None
+        self._stale = True
+        self._checked_at = 0.0
+        self.departments: Dict[int, str] = {}
+        self.research_areas: Dict[int, str] = {}
+        self.journals: Dict[int, str] = {}
+
+    def _read_versions(self, db: Session) -> Dict[str, int]:
+        rows = db.execute(
+            select(models.ReferenceDataVersion.table_name, models.ReferenceDataVersion.version)
+        ).all()
+        return dict(rows)
+
+    def load(self, db: Session):
+        versions = self._read_versions(db)
+        departments = dict(db.execute(select(models.Department.department_id, models.Department.name)).all())
+        research_areas = dict(db.execute(select(models.ResearchArea.area_id, models.ResearchArea.name)).all())
+        journals = dict(db.execute(select(models.Journal.journal_id, models.Journal.name)).all())
+        with self._lock:
+            self.departments = departments
+            self.research_areas = research_areas
+            self.journals = journals
+            self._versions = versions
+            self._stale = False
+            self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        self._stale = True
+
+    def due(self) -> bool:
+        """Whether ensure_fresh would query: after an invalidation, or once check_interval has passed"""
+        return self._stale or time.monotonic() - self._checked_at >= self.check_interval
+
+    def ensure_fresh(self, db: Session):
+        if self._stale:
+            self.load(db)
+        elif time.monotonic() - self._checked_at >= self.check_interval:
+            self._checked_at = time.monotonic()
+            if self._read_versions(db) != self._versions:
+                self.load(db)
+
+    def department_name(self, department_id: Optional[int]) -> Optional[str]:
+        return self.departments.get(department_id)
+
+    def journal_name(self, journal_id: Optional[int]) -> Optional[str]:
+        return self.journals.get(journal_id)
+
+    def research_area_name(self, area_id: int) -> Optional[str]:
+        return self.research_areas.get(area_id)
+
+    def _exists(self, db: Session, names: Dict[int, str], column, entity_id: int) -> bool:
+        if entity_id in names:
+            return True
+        # A miss may be a row another worker just added, so confirm against the table
+        found = db.execute(select(column).where(column == entity_id)).first() is not None
+        if found:
+            self.invalidate()
+        return found
+
+    def has_department(self, db: Session, department_id: int) -> bool:
+        return self._exists(db, self.departments, models.Department.department_id, department_id)
+
+    def has_journal(self, db: Session, journal_id: int) -> bool:
+        return self._exists(db, self.journals, models.Journal.journal_id, journal_id)
+
+
+reference_cache = ReferenceCache()
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_reference_versions(session, flush_context):
+    tables = {
+        obj.__tablename__
+        for obj in chain(session.new, session.dirty, session.deleted)
+        if isinstance(obj, REFERENCE_MODELS)
+    }
+    if not tables:
+        return
+    stmt = insert(models.ReferenceDataVersion).values([{'table_name': t, 'version': 1} for t in sorted(tables)])
+    session.connection().execute(
+        stmt.on_conflict_do_update(
+            index_elements=[models.ReferenceDataVersion.table_name],
+            set_={'version': models.ReferenceDataVersion.version + 1}
+        )
+    )
+    session.info.setdefault('reference_writes', set()).update(tables)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_reference_cache(session):
+    if session.info.pop('reference_writes', None):
+        reference_cache.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_reference_writes(session):
+    session.info.pop('reference_writes', None)
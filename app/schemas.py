@@ -1,6 +1,6 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
-from datetime import date
+from datetime import date, datetime
 
 class DepartmentBase(BaseModel):
     name: str
@@ -20,6 +20,8 @@ class ProfessorBase(BaseModel):
 
 class ProfessorResponse(ProfessorBase):
     professor_id: int
+    updated_at: Optional[datetime] = None
+    version: Optional[int] = None
     department: Optional[str] = None
     research_areas: List[str] = []
 
@@ -38,6 +40,8 @@ class GradStudentBase(BaseModel):
 
 class GradStudentResponse(GradStudentBase):
     student_id: int
+    updated_at: Optional[datetime] = None
+    version: Optional[int] = None
     advisor: Optional[str] = None
     department: Optional[str] = None
     research_areas: List[str] = []
@@ -60,8 +64,19 @@ class Participant(BaseModel):
     name: str
     role: Optional[str] = None
 
+class ParticipantAssignment(BaseModel):
+    id: int
+    role: Optional[str] = None
+
+class ProjectTeamUpdate(BaseModel):
+    professors: List[ParticipantAssignment] = []
+    students: List[ParticipantAssignment] = []
+    version: Optional[int] = None
+
 class ProjectResponse(ProjectBase):
     project_id: int
+    updated_at: Optional[datetime] = None
+    version: Optional[int] = None
     lead_professor: Optional[str] = None
     department: Optional[str] = None
     professors: List[Participant] = []
@@ -85,10 +100,189 @@ class Author(BaseModel):
     type: str
     order: int
 
+class AuthorAssignment(BaseModel):
+    type: str
+    id: int
+
+class PublicationAuthorsUpdate(BaseModel):
+    # In author order
+    authors: List[AuthorAssignment]
+    version: Optional[int] = None
+
 class PublicationResponse(PublicationBase):
     publication_id: int
+    updated_at: Optional[datetime] = None
+    version: Optional[int] = None
     journal: Optional[str] = None
     authors: List[Author] = []
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class AdvisorMatch(BaseModel):
+    professor_id: int
+    name: Optional[str] = None
+    score: float
+    shared_areas: int
+    advisee_count: int
+
+class StudentAdvisorMatches(BaseModel):
+    student_id: int
+    matches: List[AdvisorMatch] = []
+
+class TopPublication(BaseModel):
+    rank: int
+    publication_id: int
+    title: str
+    citations: int
+
+class CitationMetricsResponse(BaseModel):
+    entity_id: int
+    h_index: int = 0
+    i10_index: int = 0
+    total_citations: int = 0
+    publication_count: int = 0
+    top_publications: List[TopPublication] = []
+
+class LeaderboardEntry(BaseModel):
+    entity_id: int
+    name: Optional[str] = None
+    h_index: int
+    i10_index: int
+    total_citations: int
+    publication_count: int
+
+class TrendsResponse(BaseModel):
+    entity: str
+    dimensions: List[str]
+    grouping: str
+    rows: int
+    columns: Dict[str, List[Any]]
+
+class ChangeEventResponse(BaseModel):
+    seq: int
+    entity: str
+    entity_id: int
+    op: str
+    data: Optional[Dict[str, Any]] = None
+    created_at: datetime
+
+class ChangePage(BaseModel):
+    events: List[ChangeEventResponse] = []
+    next: int
+    has_more: bool
+
+class ChangePruneResponse(BaseModel):
+    deleted: int
+    pruned_before: datetime
+
+class JobSubmit(BaseModel):
+    analysis: str
+    params: Dict[str, Any] = {}
+
+class JobResponse(BaseModel):
+    job_id: str
+    analysis: str
+    params: Dict[str, Any] = {}
+    status: str
+    submitted_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+
+class RouteClassLimits(BaseModel):
+    max_concurrent: int
+    max_queue: int
+    active: int
+    waiting: int
+    admitted: int
+    rejected: int
+    timed_out: int
+
+class CoalescingStats(BaseModel):
+    in_flight: int
+    leaders: int
+    followers: int
+    timeouts: int
+
+class DirectorySearchResult(BaseModel):
+    type: str
+    id: int
+    name: str
+    email: str
+    # Trigram similarity for fuzzy matches, null for prefix matches
+    score: Optional[float] = None
+
+class FundingDistribution(BaseModel):
+    department: Optional[str] = None
+    # True for the row across all departments
+    overall: bool
+    count: int
+    min: float
+    max: float
+    mean: float
+    percentiles: Dict[str, float]
+
+class HistogramBucket(BaseModel):
+    lower: float
+    upper: float
+    count: int
+
+class FundingHistogram(BaseModel):
+    low: Optional[float] = None
+    high: Optional[float] = None
+    below: int
+    above: int
+    buckets: List[HistogramBucket]
+
+class MonthlyFunding(BaseModel):
+    month: date
+    active_projects: int
+    active_funding: float
+
+class BatchSubRequest(BaseModel):
+    # Path and query string of a GET route, e.g. /professors/1?fields=email
+    path: str
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest]
+
+class BatchSubResponse(BaseModel):
+    path: str
+    status: int
+    headers: Dict[str, str] = {}
+    body: Optional[Any] = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchSubResponse]
+
+class ProfileSummary(BaseModel):
+    profile_id: str
+    method: str
+    path: str
+    query: str = ''
+    trigger: str
+    status: Optional[int] = None
+    started_at: datetime
+    duration_ms: float
+    statement_count: int
+    sql_ms: float
+
+class ProfileStatement(BaseModel):
+    start_ms: float
+    duration_ms: float
+    sql: str
+    rows: Optional[int] = None
+    executemany: bool = False
+
+class ProfileFunction(BaseModel):
+    function: str
+    calls: int
+    primitive_calls: int
+    total_ms: float
+    cumulative_ms: float
+
+class ProfileDetail(ProfileSummary):
+    statements: List[ProfileStatement] = []
+    functions: List[ProfileFunction] = []
@@ -0,0 +1,102 @@
+-- Brings a database created from the original models up to the current app/models.py.
+-- PostgreSQL 11+. Safe to re-run: every statement is IF NOT EXISTS.
+--
+--   psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f migrations/001_sync_outbox_metrics.sql
+--
+-- CREATE INDEX locks its table against writes while it builds; on a large live
+-- database run the CREATE INDEX statements one by one as CREATE INDEX CONCURRENTLY
+-- (outside the transaction) instead.
+
+BEGIN;
+
+-- Incremental sync: updated_at on entities and association tables
+ALTER TABLE professor ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now();
+ALTER TABLE gradstudent ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now();
+ALTER TABLE project ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now();
+ALTER TABLE publication ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now();
+ALTER TABLE professor_research_areas ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now();
+ALTER TABLE student_research_areas ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now();
+ALTER TABLE professor_authors ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now();
+ALTER TABLE student_authors ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now();
+ALTER TABLE professor_project ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now();
+ALTER TABLE student_project ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now();
+
+CREATE INDEX IF NOT EXISTS ix_professor_updated_at ON professor (updated_at);
+CREATE INDEX IF NOT EXISTS ix_gradstudent_updated_at ON gradstudent (updated_at);
+CREATE INDEX IF NOT EXISTS ix_project_updated_at ON project (updated_at);
+CREATE INDEX IF NOT EXISTS ix_publication_updated_at ON publication (updated_at);
+CREATE INDEX IF NOT EXISTS ix_professor_research_areas_updated_at ON professor_research_areas (updated_at);
+CREATE INDEX IF NOT EXISTS ix_student_research_areas_updated_at ON student_research_areas (updated_at);
+CREATE INDEX IF NOT EXISTS ix_professor_authors_updated_at ON professor_authors (updated_at);
+CREATE INDEX IF NOT EXISTS ix_student_authors_updated_at ON student_authors (updated_at);
+CREATE INDEX IF NOT EXISTS ix_professor_project_updated_at ON professor_project (updated_at);
+CREATE INDEX IF NOT EXISTS ix_student_project_updated_at ON student_project (updated_at);
+
+-- Optimistic concurrency
+ALTER TABLE professor ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE gradstudent ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE project ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE publication ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+
+-- Analytics and association lookups
+CREATE INDEX IF NOT EXISTS ix_gradstudent_advisor_id ON gradstudent (advisor_id);
+CREATE INDEX IF NOT EXISTS ix_project_start_date ON project (start_date);
+CREATE INDEX IF NOT EXISTS ix_project_end_date ON project (end_date);
+CREATE INDEX IF NOT EXISTS ix_project_lead_professor_status ON project (lead_professor_id, status);
+CREATE INDEX IF NOT EXISTS ix_publication_year ON publication (year);
+CREATE INDEX IF NOT EXISTS ix_professor_authors_professor_id ON professor_authors (professor_id);
+CREATE INDEX IF NOT EXISTS ix_student_project_student_id ON student_project (student_id);
+
+-- Precomputed citation metrics; fill them afterwards with POST /analytics/citation-metrics/refresh
+CREATE TABLE IF NOT EXISTS citation_metrics (
+    scope VARCHAR(20) NOT NULL,
+    entity_id INTEGER NOT NULL,
+    h_index INTEGER NOT NULL,
+    i10_index INTEGER NOT NULL,
+    total_citations INTEGER NOT NULL,
+    publication_count INTEGER NOT NULL,
+    PRIMARY KEY (scope, entity_id)
+);
+CREATE INDEX IF NOT EXISTS ix_citation_metrics_h_index ON citation_metrics (scope, h_index);
+CREATE INDEX IF NOT EXISTS ix_citation_metrics_i10_index ON citation_metrics (scope, i10_index);
+CREATE INDEX IF NOT EXISTS ix_citation_metrics_total_citations ON citation_metrics (scope, total_citations);
+
+CREATE TABLE IF NOT EXISTS citation_top_publications (
+    scope VARCHAR(20) NOT NULL,
+    entity_id INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    publication_id INTEGER NOT NULL REFERENCES publication (publication_id) ON DELETE CASCADE,
+    citations INTEGER NOT NULL,
+    PRIMARY KEY (scope, entity_id, rank)
+);
+
+-- Reference data cache versions
+CREATE TABLE IF NOT EXISTS reference_data_version (
+    table_name VARCHAR(50) NOT NULL PRIMARY KEY,
+    version BIGINT NOT NULL
+);
+
+-- Transactional outbox / change feed
+CREATE TABLE IF NOT EXISTS change_event (
+    seq BIGSERIAL NOT NULL PRIMARY KEY,
+    entity VARCHAR(30) NOT NULL,
+    entity_id INTEGER NOT NULL,
+    op VARCHAR(10) NOT NULL,
+    data JSON,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS ix_change_event_created_at ON change_event (created_at);
+CREATE TABLE IF NOT EXISTS change_retention (
+    id INTEGER NOT NULL PRIMARY KEY,
+    pruned_before TIMESTAMP WITH TIME ZONE NOT NULL,
+    pruned_through_seq BIGINT NOT NULL
+);
+
+-- Fuzzy directory search (needs the pg_trgm contrib package on the server)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS ix_professor_full_name_trgm ON professor USING gin ((first_name || ' ' || last_name) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_professor_email_trgm ON professor USING gin (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_gradstudent_full_name_trgm ON gradstudent USING gin ((first_name || ' ' || last_name) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_gradstudent_email_trgm ON gradstudent USING gin (email gin_trgm_ops);
+
+COMMIT;
@@ -0,0 +1,167 @@
+"""CPU microbenchmark for the hot crud paths.
+
+Times each read and write the main entity endpoints make, once through the
+legacy per-call `db.query(...)` chains and once through the pre-built
+statements in app.crud, and prints Python CPU time per call. The default
+database is in-memory SQLite, so the numbers are almost all Python-side
+overhead: statement construction, compilation cache lookups and row
+processing.
+
+    python -m tools.bench_crud
+    python -m tools.bench_crud --iterations 5000 --rows 500
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.pool import StaticPool
+
+from app import crud, models
+from app.database import Base
+from app.reference import _bump_reference_versions
+
+
+def seed(db: Session, rows: int):
+    db.execute(insert(models.Department), [{'department_id': 1, 'name': 'CS'}])
+    db.execute(insert(models.ResearchArea), [{'area_id': i, 'name': f'Area {i}'} for i in range(1, 11)])
+    db.execute(insert(models.Journal), [{'journal_id': 1, 'name': 'Journal'}])
+    db.execute(insert(models.Professor), [
+        {'professor_id': i, 'first_name': 'Prof', 'last_name': str(i), 'email': f'p{i}@example.edu', 'department_id': 1}
+        for i in range(1, rows + 1)
+    ])
+    db.execute(insert(models.professor_research_areas), [
+        {'professor_id': i, 'area_id': a} for i in range(1, rows + 1) for a in (i % 10 + 1, (i + 3) % 10 + 1)
+    ])
+    db.execute(insert(models.GradStudent), [
+        {
+            'student_id': i, 'first_name': 'Student', 'last_name': str(i), 'email': f's{i}@example.edu',
+            'enrollment_date': date(2022, 9, 1), 'advisor_id': i, 'department_id': 1
+        }
+        for i in range(1, rows + 1)
+    ])
+    db.execute(insert(models.Project), [
+        {
+            'project_id': i, 'title': f'Project {i}', 'start_date': date(2023, 1, 1), 'status': 'Active',
+            'funding_amount': 1000, 'funding_source': 'NSF', 'lead_professor_id': i, 'department_id': 1
+        }
+        for i in range(1, rows + 1)
+    ])
+    db.execute(insert(models.ProfessorProject), [
+        {'project_id': i, 'professor_id': i, 'role': 'PI'} for i in range(1, rows + 1)
+    ])
+    db.execute(insert(models.Publication), [
+        {'publication_id': i, 'title': f'Paper {i}', 'journal_id': 1, 'year': 2023, 'citations': i}
+        for i in range(1, rows + 1)
+    ])
+    db.execute(insert(models.ProfessorAuthor), [
+        {'publication_id': i, 'professor_id': i, 'author_order': 1} for i in range(1, rows + 1)
+    ])
+    db.commit()
+
+
+# The query chains crud.py used before the statements were pre-built
+def legacy_get_professor(db, professor_id):
+    return db.query(models.Professor).filter(models.Professor.professor_id == professor_id).first()
+
+def legacy_get_all_professors(db, skip=0, limit=100):
+    return db.query(models.Professor).offset(skip).limit(limit).all()
+
+def legacy_get_professors_by_ids(db, ids):
+    return (
+        db.query(models.Professor)
+        .options(selectinload(models.Professor.research_areas))
+        .filter(models.Professor.professor_id.in_(ids))
+        .all()
+    )
+
+def legacy_get_publication(db, publication_id):
+    return db.query(models.Publication).filter(models.Publication.publication_id == publication_id).first()
+
+def legacy_get_projects_by_ids(db, ids):
+    return (
+        db.query(models.Project)
+        .options(
+            joinedload(models.Project.lead_professor),
+            selectinload(models.Project.professor_associations).joinedload(models.ProfessorProject.professor),
+            selectinload(models.Project.student_associations).joinedload(models.StudentProject.student)
+        )
+        .filter(models.Project.project_id.in_(ids))
+        .all()
+    )
+
+def legacy_update_professor(db, professor_id, data):
+    professor = db.query(models.Professor).filter(models.Professor.professor_id == professor_id).first()
+    for key, value in data.items():
+        setattr(professor, key, value)
+    crud.record_change(db, 'professor', professor_id, 'update', data)
+    db.commit()
+    db.refresh(professor)
+    return professor
+
+
+def update_after_lookup(update, get):
+    """The PUT endpoints look the row up first, then call the crud update"""
+    def run(db, professor_id, data):
+        get(db, professor_id)
+        return update(db, professor_id, data)
+    return run
+
+
+CASES = [
+    ('GET /professors/{id}', legacy_get_professor, crud.get_professor, lambda i: (i,)),
+    ('GET /publications/{id}', legacy_get_publication, crud.get_publication, lambda i: (i,)),
+    ('GET /professors/', legacy_get_all_professors, crud.get_all_professors, lambda i: (0, 20)),
+    ('GET /professors/?ids=', legacy_get_professors_by_ids, crud.get_professors_by_ids, lambda i: ([i, i + 1, i + 2],)),
+    ('GET /projects/?ids=', legacy_get_projects_by_ids, crud.get_projects_by_ids, lambda i: ([i, i + 1, i + 2],)),
+    (
+        'PUT /professors/{id}',
+        update_after_lookup(legacy_update_professor, legacy_get_professor),
+        update_after_lookup(crud.update_professor, crud.get_professor),
+        lambda i: (i, {'office': f'Room {i}'})
+    ),
+]
+
+
+def time_case(db: Session, fn, args_for, iterations: int, rows: int) -> float:
+    for i in range(min(iterations, 200)):
+        fn(db, *args_for(i % (rows - 3) + 1))
+        db.expunge_all()
+    elapsed = 0.0
+    for i in range(iterations):
+        args = args_for(i % (rows - 3) + 1)
+        # Start every call from an empty identity map, like a fresh request session
+        db.expunge_all()
+        start = time.process_time()
+        fn(db, *args)
+        elapsed += time.process_time() - start
+    return elapsed / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--rows', type=int, default=200)
+    args = parser.parse_args()
+
+    # Reference-data version bumps use a PostgreSQL upsert; nothing here writes reference tables
+    event.remove(Session, 'after_flush', _bump_reference_versions)
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    db = Session(engine)
+    seed(db, args.rows)
+
+    print(f"{'case':<26}{'legacy us':>12}{'cached us':>12}{'speedup':>10}")
+    for name, legacy, current, args_for in CASES:
+        before = time_case(db, legacy, args_for, args.iterations, args.rows)
+        after = time_case(db, current, args_for, args.iterations, args.rows)
+        print(f"{name:<26}{before:>12.1f}{after:>12.1f}{before / after:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()